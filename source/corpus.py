@@ -7,9 +7,121 @@ This is the file that defines Corpus class for LDA model.
 import sys
 import os
 import time
+import hashlib
+import multiprocessing
+from array import array
+import numpy as np
+from instrumentation import get_logger
 reload(sys)
 sys.setdefaultencoding('utf-8')
 
+logger = get_logger('corpus')
+
+
+def read_document_chunk(arguments):
+    """
+    The function that is run by the processes of the pool to read some documents of a directory with a vocabulary of
+    its own. It is called by the method: Corpus.load_directory_corpus.
+    :param arguments: tuple of the name of directory, list of names of documents and the character between two words.
+    :return: tuple of the list of words of the local vocabulary ordered by local id, and list of arrays of local id of
+             words in each document.
+    """
+    directory, document_name_list, sep = arguments
+    corpus = Corpus()
+    documents = []
+    for document_name in document_name_list:
+        documents.append(array('i', corpus.read_document(directory=directory, document_name=document_name, sep=sep)))
+    words = corpus.vocabulary()
+    return words, documents
+
+
+def write_files(directory, contents):
+    """
+    The function that writes files to a directory. Each file is written to a temporary file and then renamed, so that
+    an interrupted write never leaves a partly written file.
+    :param directory: the directory where the files are written, which is created if it does not exist.
+    :param contents: list of tuples of name of file and its content, which is an numpy array saved in .npy format or a
+                     string.
+    :return: Nothing.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    else:
+        pass
+    for file_name, content in contents:
+        temporary_file = os.path.join(directory, file_name + '.tmp' + str(os.getpid()))
+        file = open(temporary_file, 'wb')
+        if isinstance(content, np.ndarray):
+            np.save(file, content)
+        else:
+            file.write(content)
+        file.close()
+        if os.path.exists(os.path.join(directory, file_name)) and sys.platform.startswith('win'):
+            os.remove(os.path.join(directory, file_name))
+        else:
+            pass
+        os.rename(temporary_file, os.path.join(directory, file_name))
+
+
+def append_values(values, buffer, new_values, dtype):
+    """
+    The function that appends values to a numpy array which is the beginning of a larger buffer, so that the array
+    grows without being copied most of the time. When the buffer is full, or the array is not the beginning of it, a
+    buffer twice as large is allocated and the array is copied to it. The views of the array that were taken before
+    are never changed: they keep the old buffer alive, and the positions that they see are not written again.
+    :param values: the numpy array.
+    :param buffer: the numpy array whose beginning is values, or None.
+    :param new_values: list or numpy array of values that are appended.
+    :param dtype: the type of the values.
+    :return: tuple of the numpy array with the new values and its buffer.
+    """
+    size = len(values) + len(new_values)
+    if buffer is None or values.base is not buffer or size > len(buffer):
+        buffer = np.empty(max(2 * size, 1024), dtype=dtype)
+        buffer[:len(values)] = values
+    else:
+        pass
+    buffer[len(values):size] = new_values
+    return buffer[:size], buffer
+
+
+class Documents(object):
+    """
+    The read-only sequence of documents of a corpus. All documents are stored one after another in the flat buffer of
+    word ids of the corpus, and document m is the numpy view of the words between offsets[m] and offsets[m+1], which
+    is not copied. A view stays valid when documents are added to the corpus, but not when it is pruned.
+    """
+    def __init__(self, corpus):
+        """
+        Initialize an instance.
+        :param corpus: the corpus whose documents are viewed.
+        """
+        self.corpus = corpus
+
+    def __len__(self):
+        """
+        :return: number of documents.
+        """
+        return len(self.corpus.document_offsets) - 1
+
+    def __getitem__(self, m):
+        """
+        :param m: id of document.
+        :return: numpy array of id of all words in document m.
+        """
+        if m < 0 or m >= len(self):
+            raise IndexError('document index out of range: ' + str(m))
+        else:
+            pass
+        return self.corpus.tokens[self.corpus.document_offsets[m]:self.corpus.document_offsets[m + 1]]
+
+    def __iter__(self):
+        """
+        :return: iterator over the documents, in order of id.
+        """
+        for m in range(0, len(self), 1):
+            yield self[m]
+
 
 class Corpus(object):
     """
@@ -19,36 +131,134 @@ class Corpus(object):
         """
         Initialize an instance.
         """
-        # documents in the corpus, key: id of document, value: list of id of all words in document..
-        self.documents = {}
-        # name of documents. key:id of document, value:name of document.
-        self.documents_name_dict = {}
-        # vocabulary. key:word, value:word id.
-        self.word_id = {}
-        # vocabulary. key:word id, value:word.
-        self.id_word = {}
+        # numpy array of id of all words of all documents, one document after another.
+        self.tokens = np.zeros(0, dtype=np.int32)
+        # numpy array, [m] refers to the position in tokens where document m begins, and [m+1] where it ends.
+        self.document_offsets = np.zeros(1, dtype=np.int_)
+        # the buffers whose beginnings are tokens and document_offsets when documents are added, see the function:
+        # append_values. They are None until a document is added.
+        self.token_buffer = None
+        self.offset_buffer = None
+        # documents in the corpus, [m] refers to the array of id of all words in document m.
+        self.documents = Documents(self)
+        # name of documents. [m] refers to the name of document m.
+        self.documents_name_dict = []
+        # vocabulary. key:word, value:word id. It is None until it is used, if the vocabulary is set by set_vocabulary,
+        # see the property: word_id.
+        self.word_id_dict = {}
+        # vocabulary. key:word id, value:word. It is None until it is used as word_id_dict, see the property: id_word.
+        self.id_word_dict = {}
+        # list of words set by set_vocabulary, [t] refers to the word whose id is t, which is kept until both dicts are
+        # built.
+        self.vocabulary_words = None
+
+    @property
+    def word_id(self):
+        """
+        The vocabulary, key: word, value: word id. It is built from the words of set_vocabulary when it is used the
+        first time, so that loading a large vocabulary does not build the dicts that are not used.
+        """
+        if self.word_id_dict == None:
+            self.word_id_dict = dict(zip(self.vocabulary_words, range(0, len(self.vocabulary_words), 1)))
+            self.release_vocabulary_words()
+        else:
+            pass
+        return self.word_id_dict
+
+    @word_id.setter
+    def word_id(self, word_id):
+        self.word_id_dict = word_id
+        self.release_vocabulary_words()
+
+    @property
+    def id_word(self):
+        """
+        The vocabulary, key: word id, value: word. It is built when it is used the first time, as word_id.
+        """
+        if self.id_word_dict == None:
+            self.id_word_dict = dict(enumerate(self.vocabulary_words))
+            self.release_vocabulary_words()
+        else:
+            pass
+        return self.id_word_dict
+
+    @id_word.setter
+    def id_word(self, id_word):
+        self.id_word_dict = id_word
+        self.release_vocabulary_words()
+
+    def release_vocabulary_words(self):
+        """
+        The method that releases the list of words of set_vocabulary when both dicts have been built, after which the
+        dicts are the vocabulary.
+        :return: Nothing.
+        """
+        if self.word_id_dict != None and self.id_word_dict != None:
+            self.vocabulary_words = None
+        else:
+            pass
 
-    def load_directory_corpus(self, directory,sep=' ',key_word_list=None, no_key_word_list=None):
+    def load_directory_corpus(self, directory,sep=' ',key_word_list=None, no_key_word_list=None, workers=1,
+                              chunk_size=256, cache_directory=None):
         """
         The method to load corpus from directory, which contains the documents. And each document in the directory is an
         dependent file. Also, the document must has been tokenize and stop words were moved. And the character between
         two words is the parameter: sep.
+        The documents are added in sorted order of their names, and words are numbered in order of their first
+        appearance, so the ids do not depend on the number of workers.
         :param directory: the name of directory, which contains documents.
         :param sep: the character between two words in document. Default value is blank space.
         :param key_word_list: the string the must appeared in the name of document. Default value is None.
         :param no_key_word_list: the string the must not appeared in the name of document. Default value is None.
+        :param workers: number of processes that read and tokenize documents. Default value is 1.
+        :param chunk_size: number of documents that a process reads at once when workers > 1. Default value is 256.
+        :param cache_directory: the directory where the preprocessed corpus is cached. If the cache was built from the
+                                same documents, the corpus is memory-mapped from it instead of read from the documents.
+                                It is only used when the corpus is empty. Default value is None, which means no cache.
         :return: nothing.
         """
-        document_name_list = self.get_dirlist(path=directory,key_word_list=key_word_list,
-                                              no_key_word_list=no_key_word_list)
-        for index in range(0, len(document_name_list),1):
-            document_name = document_name_list[index]
-            document = self.read_document(directory=directory, document_name=document_name,sep=sep)
-            print 'loading document:', index, 'length:', len(document)
-            self.documents[index] = document
-            self.documents_name_dict[index] = document_name
-        print 'number of documents:', len(self.documents)
-        print 'number of terms:', len(self.word_id)
+        document_name_list = sorted(self.get_dirlist(path=directory,key_word_list=key_word_list,
+                                                     no_key_word_list=no_key_word_list))
+        start_time = time.time()
+        if cache_directory != None and len(self.documents) == 0:
+            fingerprint = self.directory_fingerprint(directory=directory, document_name_list=document_name_list, sep=sep)
+            if self.load_cache(cache_directory=cache_directory, fingerprint=fingerprint):
+                logger.info('number of documents: %d number of words: %d number of terms: %d seconds: %.3f (cache)',
+                            len(self.documents), len(self.tokens), len(self.word_id), time.time() - start_time)
+                return
+            else:
+                pass
+        else:
+            fingerprint = None
+        if workers > 1:
+            chunks = []
+            for index in range(0, len(document_name_list), chunk_size):
+                chunks.append((directory, document_name_list[index:index + chunk_size], sep))
+            pool = multiprocessing.Pool(processes=workers)
+            try:
+                # the chunks are merged in order, so that the global ids are the same as reading the documents one by
+                # one.
+                index = 0
+                for words, documents in pool.imap(read_document_chunk, chunks):
+                    local_to_global = np.array(self.words_to_ids(words), dtype=np.int32)
+                    for document in documents:
+                        self.add_document(document=local_to_global[np.frombuffer(document, dtype=np.int32)],
+                                          document_name=document_name_list[index])
+                        index += 1
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for index in range(0, len(document_name_list),1):
+                document_name = document_name_list[index]
+                document = self.read_document(directory=directory, document_name=document_name,sep=sep)
+                self.add_document(document=document, document_name=document_name)
+        if fingerprint != None:
+            self.save_cache(cache_directory=cache_directory, fingerprint=fingerprint)
+        else:
+            pass
+        logger.info('number of documents: %d number of words: %d number of terms: %d seconds: %.3f',
+                    len(self.documents), len(self.tokens), len(self.word_id), time.time() - start_time)
 
     def load_file_corpus(self,corpus_file,sep=' '):
         """
@@ -59,23 +269,48 @@ class Corpus(object):
         :param sep: the character between two words in document. Default value is blank space.
         :return: Nothing
         """
-        file = open(corpus_file,mode='r')
         index = 0
-        for line in file:
-            word_list = line.replace('\n','').split(sep)
-            document = []
-            for word in word_list:
-                if word not in self.word_id.keys():
-                    word_id = len(self.word_id)
-                    self.word_id[word] = word_id
-                    self.id_word[word_id] = word
+        for documents in self.stream_file_corpus(corpus_file=corpus_file,sep=sep):
+            for document in documents:
+                self.add_document(document=document, document_name=index)
+                index = index + 1
+
+    def stream_file_corpus(self,corpus_file,sep=' ',batch_size=256):
+        """
+        The method that reads a corpus file as load_file_corpus does, but yields the documents in batches instead of
+        adding them to the corpus, so that only one batch is in memory. The words are added to the vocabulary.
+        :param corpus_file: The file that contains all documents. It is the specific location where the file is.
+        :param sep: the character between two words in document. Default value is blank space.
+        :param batch_size: the maximal number of documents in a batch. Default value is 256.
+        :return: generator of batches, each of which is a list of documents, and each document is a list of id of
+                 words.
+        """
+        file = open(corpus_file,mode='r')
+        try:
+            documents = []
+            for line in file:
+                documents.append(self.words_to_ids(line.replace('\n','').split(sep)))
+                if len(documents) == batch_size:
+                    yield documents
+                    documents = []
                 else:
-                    word_id = self.word_id[word]
-                document.append(word_id)
-            self.documents[index] = document
-            self.documents_name_dict[index]=index
-            index = index + 1
-        file.close()
+                    pass
+            if len(documents) > 0:
+                yield documents
+            else:
+                pass
+        finally:
+            file.close()
+
+    def iterate_batches(self,batch_size=256):
+        """
+        The method that yields the documents of the corpus in batches, in order of id.
+        :param batch_size: the maximal number of documents in a batch. Default value is 256.
+        :return: generator of batches, each of which is a list of documents, and each document is an numpy array of id
+                 of words.
+        """
+        for start in range(0, len(self.documents), batch_size):
+            yield [self.documents[m] for m in range(start, min(start + batch_size, len(self.documents)), 1)]
 
     def read_document(self,directory,document_name,sep=' '):
         """
@@ -85,24 +320,274 @@ class Corpus(object):
         :param sep: character between two words in the document.
         :return: list of word id in the document.
         """
-        document = []
         file = open(directory + document_name,mode='r')
-        for line in file:
-            words_list  = line.replace('\n','').split(sep)
-            for word in words_list:
-                if len(word) >=2:
-                    if word not in self.word_id.keys():
-                        word_id = len(self.word_id)
-                        self.word_id[word] = word_id
-                        self.id_word[word_id] = word
-                    else:
-                        word_id = self.word_id[word]
-                    document.append(word_id)
-                else:
-                    pass
+        # the whole document is split at once, the end of a line separates two words as sep does.
+        words_list = file.read().replace('\n', sep).split(sep)
         file.close()
+        return self.words_to_ids([word for word in words_list if len(word) >= 2])
+
+    def words_to_ids(self, words_list):
+        """
+        The method that translates words to their ids, and adds the words that are not in the vocabulary to the
+        vocabulary.
+        :param words_list: list of words.
+        :return: list of id of the words.
+        """
+        word_id = self.word_id
+        id_word = self.id_word
+        document = []
+        for word in words_list:
+            term_id = word_id.get(word)
+            if term_id == None:
+                term_id = len(word_id)
+                word_id[word] = term_id
+                id_word[term_id] = word
+            else:
+                pass
+            document.append(term_id)
         return document
 
+    def add_document(self, document, document_name):
+        """
+        The method that appends one document to the end of the corpus.
+        :param document: list or numpy array of id of all words in the document.
+        :param document_name: name of the document.
+        :return: id of the document.
+        """
+        # a corpus that was memory-mapped from cache is copied to buffers that can grow by the first document.
+        self.tokens, self.token_buffer = append_values(values=self.tokens, buffer=self.token_buffer,
+                                                       new_values=document, dtype=np.int32)
+        self.document_offsets, self.offset_buffer = append_values(values=self.document_offsets,
+                                                                  buffer=self.offset_buffer,
+                                                                  new_values=[len(self.tokens)], dtype=np.int_)
+        self.documents_name_dict.append(document_name)
+        return len(self.documents_name_dict) - 1
+
+    def prune_vocabulary(self, min_df=1, max_df=1.0, max_terms=None, block_size=1048576):
+        """
+        The method that removes rare and common terms from the vocabulary and from all documents, before sampling. The
+        frequencies of terms and the numbers of documents that contain them are counted in one pass over the documents,
+        block by block. The remaining terms are numbered again in their old order, and the documents are rewritten in
+        the same buffers, block by block as well. A document whose words are all removed becomes empty and keeps its name. The samplers and
+        indexes that were created before are invalid after pruning.
+        :param min_df: terms that appear in less documents are removed. An integer is a number of documents, and a
+                       float in (0, 1) is a proportion of documents. Default value is 1, which means no term.
+        :param max_df: terms that appear in more documents are removed, an integer or a proportion as min_df. Default
+                       value is 1.0, which means no term.
+        :param max_terms: the maximal number of terms. If more terms remain, the most frequent ones are kept. Default
+                          value is None, which means no limit.
+        :param block_size: number of words that are counted or rewritten at once. Default value is 1048576.
+        :return: dict of removed_terms, removed_tokens, term_number, token_number and empty_documents.
+        """
+        tokens = self.token_array()
+        offsets = self.offset_array()
+        term_number = len(self.word_id)
+        document_number = len(offsets) - 1
+        # number of times that each term appears, and number of documents that contain it.
+        term_frequency = np.zeros(term_number, dtype=np.int64)
+        document_frequency = np.zeros(term_number, dtype=np.int64)
+        # the documents of every block, which are rewritten block by block as well.
+        blocks = []
+        start_document = 0
+        while start_document < document_number:
+            end_document = int(np.searchsorted(offsets, offsets[start_document] + block_size, side='right')) - 1
+            end_document = min(max(end_document, start_document + 1), document_number)
+            blocks.append((start_document, end_document))
+            start, end = offsets[start_document], offsets[end_document]
+            lengths = np.diff(offsets[start_document:end_document + 1])
+            documents = np.repeat(np.arange(start_document, end_document, dtype=np.int64), lengths)
+            pairs = np.unique(documents * term_number + tokens[start:end])
+            document_frequency += np.bincount(pairs % term_number, minlength=term_number)
+            term_frequency += np.bincount(tokens[start:end], minlength=term_number)
+            start_document = end_document
+        if isinstance(min_df, float):
+            min_df = min_df * document_number
+        else:
+            pass
+        if isinstance(max_df, float):
+            max_df = max_df * document_number
+        else:
+            pass
+        keep = (document_frequency >= min_df) & (document_frequency <= max_df)
+        if max_terms != None and keep.sum() > max_terms:
+            # the most frequent terms, and the terms with smaller ids among the equally frequent ones.
+            kept_terms = np.flatnonzero(keep)
+            order = np.lexsort((kept_terms, -term_frequency[kept_terms]))
+            keep[:] = False
+            keep[kept_terms[order[:max_terms]]] = True
+        else:
+            pass
+        # [t] refers the new id of term t, or -1 if it is removed.
+        new_id = np.full(term_number, -1, dtype=np.int32)
+        new_id[keep] = np.arange(0, int(keep.sum()), 1, dtype=np.int32)
+        token_number = int(term_frequency[keep].sum())
+        # rewrite the documents block by block, in the buffers of the corpus, where the write cursor never passes the
+        # words that are not read yet, or in a new array if the corpus was memory-mapped from cache, which is read
+        # only, or shares its arrays with other processes.
+        if self.token_buffer is not None and self.tokens.base is self.token_buffer:
+            new_tokens = tokens
+        else:
+            new_tokens = np.empty(token_number, dtype=np.int32)
+        # [m] refers to the number of words of document m that are kept.
+        lengths = np.zeros(document_number, dtype=np.int64)
+        cursor = 0
+        for start_document, end_document in blocks:
+            start, end = offsets[start_document], offsets[end_document]
+            block = new_id[tokens[start:end]]
+            kept_tokens = block >= 0
+            # number of kept words before every position of the block.
+            kept_number = np.concatenate([[0], kept_tokens.cumsum()])
+            lengths[start_document:end_document] = kept_number[offsets[start_document + 1:end_document + 1] - start] - \
+                kept_number[offsets[start_document:end_document] - start]
+            block = block[kept_tokens]
+            new_tokens[cursor:cursor + len(block)] = block
+            cursor += len(block)
+        new_offsets = np.concatenate([[0], lengths.cumsum()])
+        words = [self.id_word[t] for t in np.flatnonzero(keep).tolist()]
+        report = {'removed_terms': term_number - len(words), 'removed_tokens': len(tokens) - token_number,
+                  'term_number': len(words), 'token_number': token_number,
+                  'empty_documents': int((lengths == 0).sum())}
+        if new_tokens is tokens:
+            self.tokens = self.token_buffer[:token_number]
+            offsets[:] = new_offsets
+        else:
+            self.tokens = new_tokens
+            self.document_offsets = new_offsets.astype(np.int_)
+        self.set_vocabulary(words)
+        logger.info('pruning removed %d of %d terms and %d of %d words, %d documents are empty',
+                    report['removed_terms'], term_number, report['removed_tokens'],
+                    report['removed_tokens'] + report['token_number'], report['empty_documents'])
+        return report
+
+    def select_documents(self, document_list):
+        """
+        The method that creates a corpus of some documents of this corpus, with the same vocabulary, for example to
+        hold out some documents from training.
+        :param document_list: list of id of documents.
+        :return: an instance of class: Corpus, whose document m is document document_list[m] of this corpus.
+        """
+        tokens = self.token_array()
+        offsets = self.offset_array()
+        document_list = np.asarray(document_list, dtype=np.int64)
+        lengths = offsets[document_list + 1] - offsets[document_list]
+        # positions of the words of the selected documents in tokens.
+        positions = np.repeat(offsets[document_list] - np.concatenate([[0], lengths.cumsum()[:-1]]), lengths) + \
+            np.arange(0, int(lengths.sum()), 1)
+        corpus = Corpus()
+        corpus.tokens = tokens[positions].astype(np.int32)
+        corpus.document_offsets = np.concatenate([[0], lengths.cumsum()]).astype(np.int_)
+        corpus.documents_name_dict = [self.documents_name_dict[m] for m in document_list.tolist()]
+        corpus.set_vocabulary(self.vocabulary())
+        return corpus
+
+    def token_array(self):
+        """
+        The method that gets the id of all words of all documents as an numpy array, which shares memory with the
+        corpus. The array does not see the documents that are added to the corpus later.
+        :return: numpy array of id of all words of all documents.
+        """
+        return self.tokens
+
+    def offset_array(self):
+        """
+        The method that gets the offsets of all documents as an numpy array, which shares memory with the corpus.
+        :return: numpy array whose [m] and [m+1] are the positions where document m begins and ends.
+        """
+        return self.document_offsets
+
+    def save_cache(self, cache_directory, fingerprint):
+        """
+        The method that saves the corpus to a binary cache: the ids of all words and the offsets of documents as numpy
+        arrays, the vocabulary and the names of documents as text with one item per line. Each file is written to a
+        temporary file and then renamed, and the fingerprint is written last, so a cache that is interrupted while
+        being written is never used.
+        :param cache_directory: the directory where the cache is saved.
+        :param fingerprint: the fingerprint of the documents that the corpus was read from.
+        :return: Nothing.
+        """
+        fingerprint_file = os.path.join(cache_directory, 'fingerprint.txt')
+        if os.path.exists(fingerprint_file):
+            os.remove(fingerprint_file)
+        else:
+            pass
+        contents = [('tokens.npy', self.token_array()), ('document_offsets.npy', self.offset_array()),
+                    ('vocabulary.txt', '\n'.join(self.vocabulary())),
+                    ('documents.txt', '\n'.join([str(name) for name in self.documents_name_dict])),
+                    ('fingerprint.txt', fingerprint)]
+        write_files(directory=cache_directory, contents=contents)
+
+    def load_cache(self, cache_directory, fingerprint):
+        """
+        The method that loads the corpus from the binary cache saved by save_cache, if its fingerprint is the given
+        one. The ids of words and the offsets of documents are memory-mapped, not read.
+        :param cache_directory: the directory where the cache is saved.
+        :param fingerprint: the fingerprint of the documents that the corpus should be read from.
+        :return: True if the corpus is loaded from the cache, or False if there is no valid cache.
+        """
+        fingerprint_file = os.path.join(cache_directory, 'fingerprint.txt')
+        if not os.path.exists(fingerprint_file):
+            return False
+        else:
+            pass
+        file = open(fingerprint_file, 'rb')
+        cached_fingerprint = file.read()
+        file.close()
+        if cached_fingerprint != fingerprint:
+            return False
+        else:
+            pass
+        self.tokens = np.load(os.path.join(cache_directory, 'tokens.npy'), mmap_mode='r')
+        self.document_offsets = np.load(os.path.join(cache_directory, 'document_offsets.npy'), mmap_mode='r')
+        file = open(os.path.join(cache_directory, 'vocabulary.txt'), 'rb')
+        words = file.read().split('\n')
+        file.close()
+        if len(self.tokens) == 0 and words == ['']:
+            words = []
+        else:
+            pass
+        self.set_vocabulary(words)
+        file = open(os.path.join(cache_directory, 'documents.txt'), 'rb')
+        self.documents_name_dict = file.read().split('\n')[0:len(self.document_offsets) - 1]
+        file.close()
+        return True
+
+    def vocabulary(self):
+        """
+        The method that gets all words of the vocabulary.
+        :return: list of words, [t] refers to the word whose id is t.
+        """
+        if self.vocabulary_words != None:
+            return list(self.vocabulary_words)
+        else:
+            return [self.id_word[term_id] for term_id in range(0, len(self.id_word), 1)]
+
+    def set_vocabulary(self, words):
+        """
+        The method that replaces the vocabulary. The dicts of the vocabulary are built when they are used.
+        :param words: list of words, [t] refers to the word whose id is t.
+        :return: Nothing.
+        """
+        self.vocabulary_words = list(words)
+        self.word_id_dict = None
+        self.id_word_dict = None
+
+    @staticmethod
+    def directory_fingerprint(directory, document_name_list, sep):
+        """
+        The method that calculates the fingerprint of documents in a directory, which changes when a document is added,
+        removed or modified, or when the documents are read in another way.
+        :param directory: the name of directory, which contains documents.
+        :param document_name_list: list of names of documents.
+        :param sep: the character between two words in document.
+        :return: the fingerprint, a string.
+        """
+        md5 = hashlib.md5()
+        md5.update('sep:' + repr(sep) + '\n')
+        for document_name in document_name_list:
+            status = os.stat(directory + document_name)
+            md5.update(document_name + '\t' + str(status.st_size) + '\t' + repr(status.st_mtime) + '\n')
+        return md5.hexdigest()
+
     def word_to_id(self, word):
         """
         The method translates an word to it's id.
@@ -117,7 +602,10 @@ class Corpus(object):
         :param term_id: id needed to be translated.
         :return: word of the id.
         """
-        return self.id_word[term_id]
+        if self.vocabulary_words != None:
+            return self.vocabulary_words[term_id]
+        else:
+            return self.id_word[term_id]
 
     @staticmethod
     def get_dirlist(path, key_word_list=None, no_key_word_list=None):
@@ -0,0 +1,259 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the class: DocumentIndex, which finds the documents whose distributions over topics are the most
+similar to a query.
+"""
+import sys
+import random
+import numpy as np
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class DocumentIndex(object):
+    """
+    The class, which indexes the distribution of documents over topics for top-k queries of similar documents, under
+    one of the distances:
+        'hellinger':   sqrt(1 - sum_k sqrt(p[k] * q[k]))
+        'cosine':      1 - p . q / (|p| |q|)
+        'js':          Jensen-Shannon divergence, 0.5 * KL(p || m) + 0.5 * KL(q || m), m = (p + q) / 2
+    The vectors are stored as a contiguous float32 matrix, as p / |p| for 'cosine' and sqrt(p) otherwise, so that the
+    first two distances are given by a matrix product, and p of 'js' is the square of the vector. The queries and the
+    documents are scanned in blocks of at most block_size pairs, so the memory of a query does not grow with the number
+    of documents or of queries.
+    In the approximate mode, the stored vectors are clustered by k-means, and a query only scans the documents of the
+    probe_number clusters whose centers are the nearest to it.
+    """
+    def __init__(self, document_distribution_over_topic, document_names=None, metric='hellinger', cluster_number=None,
+                 probe_number=8, iteration_number=10, block_size=65536):
+        """
+        The method that initializes an instance of the class.
+        :param document_distribution_over_topic: an M * K array, [m][k] refers the probability that assigning topic k
+                                                 to document m.
+        :param document_names: list of names of documents, such as Corpus.documents_name_dict. Default value is None,
+                               which means documents can only be queried by their ids.
+        :param metric: 'hellinger', 'cosine' or 'js'. Default value is 'hellinger'.
+        :param cluster_number: number of clusters of the approximate mode. Default value is None, which means the
+                               queries are exact.
+        :param probe_number: number of clusters scanned by a query in the approximate mode. Default value is 8.
+        :param iteration_number: number of iterations of k-means. Default value is 10.
+        :param block_size: number of pairs of a query and a document compared at once, which is the number of documents
+                           scanned at once by a single query. Default value is 65536.
+        """
+        if metric not in ('hellinger', 'cosine', 'js'):
+            raise ValueError('unknown metric: ' + str(metric))
+        else:
+            pass
+        self.metric = metric
+        self.block_size = block_size
+        self.probe_number = probe_number
+        distribution = np.asarray(document_distribution_over_topic, dtype=np.float32)
+        self.document_number, self.topic_number = distribution.shape
+        # the stored vectors, [m] refers the vector of document m.
+        self.vectors = self.transform(distribution)
+        # key: name of document, value: id of document.
+        self.document_id = {}
+        self.document_names = document_names
+        if document_names != None:
+            for m in range(0, len(document_names), 1):
+                self.document_id[document_names[m]] = m
+        else:
+            pass
+        # the clusters of the approximate mode: number of clusters, [c] refers the center of cluster c, the ids of
+        # documents ordered by cluster, and [c] and [c + 1] refer the positions in the ordered ids where cluster c
+        # begins and ends.
+        self.cluster_number = None
+        self.cluster_centers = None
+        self.cluster_documents = None
+        self.cluster_offsets = None
+        if cluster_number != None:
+            self.build_clusters(min(cluster_number, self.document_number), iteration_number)
+        else:
+            pass
+
+    def transform(self, distribution):
+        """
+        The method that transforms distributions to the vectors whose dot product gives the similarity.
+        :param distribution: an N * K array of distributions.
+        :return: an N * K contiguous float32 array.
+        """
+        distribution = np.asarray(distribution, dtype=np.float32)
+        if self.metric == 'cosine':
+            norms = np.sqrt((distribution * distribution).sum(axis=1))
+            vectors = distribution / np.maximum(norms, 1e-30)[:, np.newaxis]
+        else:
+            vectors = np.sqrt(np.maximum(distribution, 0))
+        # denormal numbers are flushed to zero, which would make the matrix products many times slower.
+        vectors[vectors < 1e-30] = 0
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def build_clusters(self, cluster_number, iteration_number, sample_size=64):
+        """
+        The method that clusters the stored vectors by k-means, whose centers are initialized by random documents. The
+        centers are trained on a random sample of at most sample_size documents per cluster, then all documents are
+        assigned to their nearest centers.
+        :param cluster_number: number of clusters.
+        :param iteration_number: number of iterations.
+        :param sample_size: number of documents per cluster that the centers are trained on. Default value is 64.
+        :return: Nothing.
+        """
+        random_state = np.random.RandomState(random.randint(0, 2 ** 31 - 1))
+        sample = random_state.permutation(self.document_number)[:cluster_number * sample_size]
+        # the centers are the first documents of the permutation, before the sample is sorted for reading in order.
+        centers = self.vectors[sample[:cluster_number]].copy()
+        vectors = self.vectors[np.sort(sample)]
+        for iteration_index in range(0, iteration_number, 1):
+            clusters = self.nearest_centers(centers, vectors)
+            sums = np.empty(centers.shape, dtype=np.float64)
+            for k in range(0, self.topic_number, 1):
+                sums[:, k] = np.bincount(clusters, weights=vectors[:, k], minlength=cluster_number)
+            counts = np.bincount(clusters, minlength=cluster_number)
+            # an empty cluster keeps its center.
+            nonempty = counts > 0
+            centers[nonempty] = sums[nonempty] / counts[nonempty][:, np.newaxis]
+        clusters = self.nearest_centers(centers, self.vectors)
+        self.cluster_number = cluster_number
+        self.cluster_centers = centers
+        self.cluster_documents = np.argsort(clusters, kind='mergesort')
+        self.cluster_offsets = np.concatenate([[0], np.bincount(clusters, minlength=cluster_number).cumsum()])
+
+    def nearest_centers(self, centers, vectors):
+        """
+        The method that finds the nearest center of every vector in Euclidean distance, block by block.
+        :param centers: an C * K array of centers.
+        :param vectors: an N * K array of vectors.
+        :return: an numpy array, [n] refers the cluster of vector n.
+        """
+        clusters = np.empty(len(vectors), dtype=np.int64)
+        center_norms = (centers * centers).sum(axis=1)
+        for start in range(0, len(vectors), self.block_size):
+            block = vectors[start:start + self.block_size]
+            clusters[start:start + len(block)] = (center_norms - 2 * block.dot(centers.T)).argmin(axis=1)
+        return clusters
+
+    def distances(self, query_vectors, vectors):
+        """
+        The method that calculates the distances between queries and some documents.
+        :param query_vectors: the transformed queries.
+        :param vectors: the stored vectors of the documents.
+        :return: an Q * N array of distances.
+        """
+        if self.metric == 'hellinger':
+            return np.sqrt(np.maximum(1 - query_vectors.dot(vectors.T), 0))
+        elif self.metric == 'cosine':
+            return 1 - query_vectors.dot(vectors.T)
+        else:
+            # in float64, so that the small probabilities do not underflow.
+            p = np.square(query_vectors, dtype=np.float64)[:, np.newaxis, :]
+            q = np.square(vectors, dtype=np.float64)[np.newaxis, :, :]
+            total = p + q
+            with np.errstate(divide='ignore', invalid='ignore'):
+                divergence = np.where(p > 0, p * np.log(2 * p / total), 0) + \
+                    np.where(q > 0, q * np.log(2 * q / total), 0)
+            return 0.5 * divergence.sum(axis=2)
+
+    def query(self, distributions, k=10, exclude=None):
+        """
+        The method that finds the k nearest documents of every query distribution.
+        :param distributions: an Q * K array of distributions over topics, or one distribution.
+        :param k: number of neighbors. Default value is 10.
+        :param exclude: list of id of a document excluded from the neighbors of every query, or None for no document.
+                        Default value is None.
+        :return: tuple of an Q * k array of id of documents and an Q * k array of their distances, both ordered from
+                 the nearest. If there are less than k candidates, ids are -1 and distances are inf.
+        """
+        distributions = np.asarray(distributions, dtype=np.float32)
+        if distributions.ndim == 1:
+            distributions = distributions[np.newaxis, :]
+        else:
+            pass
+        query_number = len(distributions)
+        query_vectors = self.transform(distributions)
+        best_ids = np.full((query_number, k), -1, dtype=np.int64)
+        best_distances = np.full((query_number, k), np.inf, dtype=np.float64)
+        # a JS block is Q * N * K, so it has less pairs.
+        pair_number = self.block_size if self.metric != 'js' else max(self.block_size // max(self.topic_number, 1), 1)
+        # the queries are answered in chunks of about sqrt(pair_number), so that a block of a chunk of queries and of
+        # documents has at most pair_number pairs.
+        query_block = min(max(query_number, 1), max(int(np.sqrt(pair_number)), 1))
+        block_size = max(pair_number // query_block, 1)
+        for query_start in range(0, query_number, query_block):
+            rows = np.arange(query_start, min(query_start + query_block, query_number))
+            if self.cluster_number == None:
+                for start in range(0, self.document_number, block_size):
+                    ids = np.arange(start, min(start + block_size, self.document_number))
+                    self.merge(query_vectors[rows], ids, best_ids, best_distances, exclude, rows)
+            else:
+                # the nearest centers in Euclidean distance, which have the largest q . c - |c|^2 / 2.
+                center_score = query_vectors[rows].dot(self.cluster_centers.T) - \
+                    0.5 * (self.cluster_centers * self.cluster_centers).sum(axis=1)
+                probes = np.argsort(-center_score, axis=1)[:, :self.probe_number]
+                for query, probe in zip(rows.tolist(), probes.tolist()):
+                    ids = np.concatenate([self.cluster_documents[self.cluster_offsets[c]:self.cluster_offsets[c + 1]]
+                                          for c in probe])
+                    one = np.array([query])
+                    for start in range(0, len(ids), pair_number):
+                        self.merge(query_vectors[one], ids[start:start + pair_number], best_ids, best_distances,
+                                   exclude, one)
+        return best_ids, best_distances
+
+    def merge(self, query_vectors, ids, best_ids, best_distances, exclude, rows):
+        """
+        The method that merges a block of documents into the k nearest documents of some queries.
+        :param query_vectors: the transformed queries.
+        :param ids: numpy array of id of documents of the block.
+        :param best_ids: the Q * k array of id of the nearest documents, which is updated.
+        :param best_distances: the Q * k array of distances of the nearest documents, which is updated.
+        :param exclude: list of id of a document excluded from the neighbors of every query, or None.
+        :param rows: the rows of best_ids and best_distances of the queries.
+        :return: Nothing.
+        """
+        k = best_ids.shape[1]
+        distances = self.distances(query_vectors, self.vectors[ids])
+        if exclude != None:
+            distances[np.asarray(exclude)[rows][:, np.newaxis] == ids] = np.inf
+        else:
+            pass
+        candidate_ids = np.hstack([best_ids[rows], np.broadcast_to(ids, distances.shape)])
+        candidate_distances = np.hstack([best_distances[rows], distances])
+        if candidate_distances.shape[1] > k:
+            top = np.argpartition(candidate_distances, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(candidate_distances.shape[1]), candidate_distances.shape)
+        top_distances = np.take_along_axis(candidate_distances, top, axis=1)
+        order = np.argsort(top_distances, axis=1, kind='mergesort')
+        best_distances[rows, :top.shape[1]] = np.take_along_axis(top_distances, order, axis=1)
+        best_ids[rows, :top.shape[1]] = np.take_along_axis(np.take_along_axis(candidate_ids, top, axis=1), order,
+                                                           axis=1)
+        # the candidates that are excluded are not neighbors.
+        best_ids[rows] = np.where(np.isinf(best_distances[rows]), -1, best_ids[rows])
+
+    def query_documents(self, documents, k=10):
+        """
+        The method that finds the k nearest documents of indexed documents, excluding themselves.
+        :param documents: list of documents, each of which is its id or its name in document_names.
+        :param k: number of neighbors. Default value is 10.
+        :return: tuple of an Q * k array of id of documents and an Q * k array of their distances, see query.
+        """
+        ids = []
+        for document in documents:
+            if document in self.document_id:
+                ids.append(self.document_id[document])
+            elif isinstance(document, (int, long, np.integer)) and 0 <= document < self.document_number:
+                ids.append(int(document))
+            else:
+                raise KeyError('unknown document: ' + str(document))
+        return self.query(self.inverse_transform(self.vectors[ids]), k=k, exclude=ids)
+
+    def inverse_transform(self, vectors):
+        """
+        The method that gets distributions back from stored vectors, up to a factor, which the distances do not depend
+        on.
+        :param vectors: an N * K array of stored vectors.
+        :return: an N * K array.
+        """
+        if self.metric == 'cosine':
+            return vectors
+        else:
+            return vectors * vectors
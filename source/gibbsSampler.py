@@ -4,17 +4,31 @@
 The file that defines the class: GibbsSampler for LDA model.
 """
 import sys
+import os
+import math
+import time
 import random
-import datetime
-import pandas as pd
+import cPickle
+from bisect import bisect_right
+import numpy as np
+from inferencer import Inferencer
+from specialFunctions import digamma
+from instrumentation import get_logger
+from instrumentation import NULL_PHASE
 reload(sys)
 sys.setdefaultencoding('utf-8')
 
+logger = get_logger('gibbsSampler')
+
 
 class GibbsSampler(object):
     """
     The class, which is used to inference for LDA model by Gibbs Sampling.
     """
+    # the documents are sampled with Python lists when there are less topics than it, see sample_documents_by_lists, and
+    # with numpy arrays otherwise, see sample_document.
+    list_kernel_topics = 120
+
     def __init__(self,corpus,topic_number=10,iteration_number=1000,burn_in=500,update_cycle=100,alpha=None,beta=None):
         """
         The method that initializes an instance of the class.
@@ -28,8 +42,12 @@ class GibbsSampler(object):
         :param beta: an vector, parameter of LDA, which determines the distribution of topics over terms in the first
                       and whose length is equal to the number of terms. Default value is None.
         """
-        # documents, key: id of document, value: list of word in an specific document.
+        # documents, [m] refers to the array of id of all words in document m.
         self.documents = corpus.documents
+        # id of all words of all documents, one document after another.
+        self.tokens = corpus.token_array()
+        # [m] and [m+1] refer to the positions in tokens where document m begins and ends.
+        self.document_offsets = corpus.offset_array()
         # number of iteration when using Gibbs Sampling.
         self.iteration_number = iteration_number
         self.topic_number = topic_number
@@ -38,60 +56,571 @@ class GibbsSampler(object):
         # number of terms.
         self.term_number = len(corpus.word_id)
         # number of documents.
-        self.document_number = len(self.documents)
+        self.document_number = len(self.document_offsets) - 1
         # if alpha and beta is None, then assign values to them.
         if alpha == None:
-            self.alpha = [2.0] * self.topic_number
+            alpha = [2.0] * self.topic_number
         else:
-            self.alpha = alpha
+            pass
         if beta == None:
-            self.beta = [0.5] * self.term_number
+            beta = [0.5] * self.term_number
         else:
-            self.beta = beta
-        # The sum of elements in beta.
-        self.sum_beta = sum(self.beta)
+            pass
+        # The sum of elements in beta. Summed in the order of the given vector, so that it does not depend on numpy.
+        self.sum_beta = float(sum(beta))
         # The sum of elements in alpha.
-        self.sum_alpha = sum(self.alpha)
+        self.sum_alpha = float(sum(alpha))
+        self.alpha = np.asarray(alpha, dtype=np.float64)
+        self.beta = np.asarray(beta, dtype=np.float64)
         # counter, [m][k] refers to the number of times that topic k has been observed with a word in document m.
-        self.document_topic_count_matrix = {}
-        # counter, [k][t] refers to the number of times that term t has been observed with topic k.
-        self.topic_term_count_matrix = {}
+        self.document_topic_count_matrix = None
+        # counter, [k][t] refers to the number of times that term t has been observed with topic k. It is stored in
+        # column-major order, so that the K counts of one term, which are read for every token, are contiguous.
+        self.topic_term_count_matrix = None
         # distribution matrix, [m][k] refers the probability that assigning topic k to document m.
-        self.document_distribution_over_topic = {}
+        self.document_distribution_over_topic = None
         # distribution matrix, [k][t] refers the probability that assigning topic k to term t.
-        self.topic_distribution_over_term = {}
+        self.topic_distribution_over_term = None
+        # the type of the distribution matrices, which are contiguous arrays. float32 halves their memory, and its
+        # precision is enough for probabilities averaged over samples. The accumulators are float64.
+        self.distribution_dtype = np.float32
         # counter, [m] refers the number of times that all topics have been observed with a word in document m.
         # also, [m] equals to the number of words in document m.
-        self.sum_document_by_topic_count = {}
+        self.sum_document_by_topic_count = None
         # counter, [k] refers the number of times that all terms have been observed with topic k.
-        self.sum_topic_by_term_count = {}
-        # topic assigned to an word in a document. [m][n] refers to the topic that assigned to the n th word in document
-        # m.
-        self.word_topic_assignment = {}
+        self.sum_topic_by_term_count = None
+        # topic assigned to all words of all documents, parallel to tokens. [document_offsets[m] + n] refers to the topic
+        # that assigned to the n th word in document m.
+        self.word_topic_assignment = None
         # the number of times that the distribution has been updated.
         self.update_number = 0.0
+        # the position of the next old document to sample in sample_new_documents.
+        self.refresh_position = 0
+        # accumulator, [m][k] refers the sum of probabilities that assigning topic k to document m over all updates.
+        self.document_distribution_sum = None
+        # accumulator, [k][t] refers the sum of n_kt / (n_k + sum_beta) over all updates, which is only changed where
+        # n_kt is not zero. It is column-major as the counter of topics over terms.
+        self.topic_term_weight_sum = None
+        # accumulator, [k] refers the sum of 1 / (n_k + sum_beta) over all updates, so that the smoothing part of the
+        # sum of probabilities that assigning topic k to term t is beta[t] times it.
+        self.topic_smoothing_sum = None
+        # cache of log gamma, key: base b, value: an numpy array whose [n] refers to lgamma(b + n) - lgamma(b).
+        self.log_gamma_tables = {}
+        # the instance of class: Instrumentation that measures the phases of sampling, or None.
+        self.instrumentation = None
 
-    def gibbs_sample(self):
+    def gibbs_sample(self, checkpoint_file=None, checkpoint_cycle=50, resume=False, monitor_cycle=None,
+                     tolerance=None, held_out_documents=None, callback=None, optimize_cycle=None, optimize_beta=False):
         """
         The method that realizes the Gibbs Sampling.
+        :param checkpoint_file: the file where the state of sampler is saved every checkpoint_cycle iterations. Default
+                                value is None, which means no checkpoint.
+        :param checkpoint_cycle: how often does we save the state of sampler.
+        :param resume: boolean value, whether to continue from the state saved in checkpoint_file if it exists. The
+                       chain continues exactly as if it had not been interrupted.
+        :param monitor_cycle: how often does we calculate the log likelihood and the held out perplexity. Default value
+                              is None, which means never.
+        :param tolerance: the sampling stops early when the relative improvement of the log likelihood between two
+                          checks is less than it. Default value is None, which means never.
+        :param held_out_documents: list of documents, each of which is a list of id of words, whose perplexity is
+                                   calculated with the log likelihood. Default value is None.
+        :param callback: a function that is called with the statistics of every iteration, see iterate_gibbs_sample.
+                         Default value is None.
+        :param optimize_cycle: how often does we optimize alpha after burn in, see optimize_hyperparameters. Default
+                               value is None, which means alpha and beta are constant.
+        :param optimize_beta: boolean value, whether to optimize beta with alpha. Default value is False.
         :return: Nothing.
         """
-        # Initialize the initial state of Markov Chain.
-        self.initialize()
+        for statistics in self.iterate_gibbs_sample(checkpoint_file=checkpoint_file, checkpoint_cycle=checkpoint_cycle,
+                                                    resume=resume, monitor_cycle=monitor_cycle, tolerance=tolerance,
+                                                    held_out_documents=held_out_documents,
+                                                    optimize_cycle=optimize_cycle, optimize_beta=optimize_beta):
+            if callback != None:
+                callback(statistics)
+            else:
+                pass
+
+    def iterate_gibbs_sample(self, checkpoint_file=None, checkpoint_cycle=50, resume=False, monitor_cycle=None,
+                             tolerance=None, held_out_documents=None, optimize_cycle=None, optimize_beta=False):
+        """
+        The generator that realizes the Gibbs Sampling, and yields the statistics of every iteration as a dict:
+            iteration:          index of the iteration.
+            seconds:            seconds of the sweep.
+            tokens_per_second:  number of words sampled per second.
+            topic_changes:      number of words whose topic was changed by the sweep, or None if it is not calculated
+                                in this iteration, as log_likelihood.
+            log_likelihood:     log p(w, z) of the state, or None if it is not calculated in this iteration.
+            perplexity:         perplexity of held_out_documents, or None if it is not calculated in this iteration.
+            converged:          boolean value, whether the sampling stops after this iteration because of tolerance.
+        The final distributions are calculated when the generator is exhausted. The parameters are the same as
+        gibbs_sample.
+        """
+        with self.measure('initialize', tokens=len(self.tokens)):
+            if resume == True and checkpoint_file != None and os.path.exists(checkpoint_file):
+                # Continue the Markov Chain from the checkpoint.
+                first_iteration = self.load_checkpoint(checkpoint_file)
+                logger.info('resume from iteration: %d', first_iteration)
+            else:
+                # Initialize the initial state of Markov Chain.
+                self.initialize()
+                first_iteration = 0
+        last_log_likelihood = None
         # Gibbs Sampling.
-        for iteration_index in range(0, self.iteration_number, 1):
-            for m in range(0,self.document_number,1):
-                for n in range(0, len(self.documents[m]), 1):
-                    # Change the state of word_m_n according to it's full conditional probability.
-                    self.sample_by_full_condition(m=m,n=n)
-            print 'iteration:', iteration_index,datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for iteration_index in range(first_iteration, self.iteration_number, 1):
+            monitored = monitor_cycle != None and (iteration_index + 1) % monitor_cycle == 0
+            if monitored == True:
+                # the state before the sweep, to count the changed topics.
+                last_word_topic_assignment = self.word_topic_assignment.copy()
+            else:
+                pass
+            start_time = time.time()
+            with self.measure('sweep', tokens=len(self.tokens)) as record:
+                record['iteration'] = iteration_index
+                self.sweep()
+            seconds = time.time() - start_time
+            logger.debug('iteration: %d seconds: %.3f', iteration_index, seconds)
+            statistics = {'iteration': iteration_index, 'seconds': seconds,
+                          'tokens_per_second': len(self.tokens) / max(seconds, 1e-9),
+                          'topic_changes': None, 'log_likelihood': None, 'perplexity': None, 'converged': False}
+            if monitored == True:
+                statistics['topic_changes'] = int((last_word_topic_assignment != self.word_topic_assignment).sum())
+                statistics['log_likelihood'] = self.log_likelihood()
+                if held_out_documents != None:
+                    statistics['perplexity'] = self.perplexity(held_out_documents)
+                else:
+                    pass
+                logger.info('iteration: %d log likelihood: %s perplexity: %s', iteration_index,
+                            statistics['log_likelihood'], statistics['perplexity'])
+                if tolerance != None and last_log_likelihood != None and \
+                        (statistics['log_likelihood'] - last_log_likelihood) < tolerance * abs(last_log_likelihood):
+                    statistics['converged'] = True
+                else:
+                    pass
+                last_log_likelihood = statistics['log_likelihood']
+            else:
+                pass
             if iteration_index > self.burn_in and iteration_index % self.update_cycle == 0:
                 # Update the distribution after burn in.
-                self.update_distribution()
+                with self.measure('update_distribution'):
+                    self.update_distribution()
+            else:
+                pass
+            if optimize_cycle != None and iteration_index > self.burn_in and iteration_index % optimize_cycle == 0:
+                # Optimize the hyperparameters after burn in, after the state sampled with them has been used.
+                self.optimize_hyperparameters(optimize_beta=optimize_beta)
+            else:
+                pass
+            if checkpoint_file != None and (iteration_index + 1) % checkpoint_cycle == 0:
+                self.save_checkpoint(checkpoint_file, iteration_number=iteration_index + 1)
+            else:
+                pass
+            yield statistics
+            if statistics['converged'] == True:
+                logger.info('converged at iteration: %d', iteration_index)
+                break
             else:
                 pass
         # calculate the final distribution.
-        self.get_distribution()
+        with self.measure('get_distribution'):
+            self.get_distribution()
+
+    def measure(self, name, tokens=None):
+        """
+        The method that measures a phase by the instrumentation, which is used by the statement: with. It measures
+        nothing if there is no instrumentation.
+        :param name: name of the phase.
+        :param tokens: number of words that the phase processes. Default value is None.
+        :return: the phase, whose record is a dict.
+        """
+        if self.instrumentation != None:
+            return self.instrumentation.phase(name, tokens=tokens)
+        else:
+            return NULL_PHASE
+
+    def optimize_hyperparameters(self, optimize_beta=False, iteration_number=20, tolerance=1e-6):
+        """
+        The method that optimizes alpha, and optionally beta, by Minka's fixed point iteration for the Dirichlet
+        -multinomial likelihood of the current state:
+            alpha[k] <- alpha[k] * sum_n C_k(n) (digamma(n + alpha[k]) - digamma(alpha[k]))
+                                 / sum_n C(n) (digamma(n + sum_alpha) - digamma(sum_alpha))
+        where C_k(n) is the number of documents with n words assigned to topic k, and C(n) the number of documents with
+        n words. The counts are read once to build the histograms, so the cost of the iterations depends on the number
+        of topics and the largest count, not on the number of words. beta is optimized as one value shared by all
+        terms, in the same way over the histogram of the nonzero counts of topics over terms, and needs beta to be the
+        same for all terms.
+        :param optimize_beta: boolean value, whether to optimize beta. Default value is False.
+        :param iteration_number: the maximal number of fixed point iterations. Default value is 20.
+        :param tolerance: the iterations stop when the relative change of every parameter is less than it.
+        :return: Nothing.
+        """
+        if optimize_beta == True and np.any(self.beta != self.beta[0]):
+            raise ValueError('beta can only be optimized when it is the same for all terms')
+        else:
+            pass
+        # histogram, [k][n] refers the number of documents where n words are assigned to topic k.
+        counts = np.asarray(self.document_topic_count_matrix, dtype=np.int64)
+        width = int(counts.max()) + 1
+        topic_histogram = np.bincount((counts + np.arange(0, self.topic_number, 1) * width).ravel(),
+                                      minlength=self.topic_number * width).reshape(self.topic_number, width)[:, 1:]
+        # histogram, [n] refers the number of documents with n words.
+        length_histogram = np.bincount(np.asarray(self.sum_document_by_topic_count, dtype=np.int64))[1:]
+        numbers = np.arange(1, width, 1, dtype=np.float64)
+        lengths = np.arange(1, len(length_histogram) + 1, 1, dtype=np.float64)
+        alpha = self.alpha.copy()
+        for iteration_index in range(0, iteration_number, 1):
+            numerator = (topic_histogram * (digamma(numbers + alpha[:, np.newaxis]) -
+                                            digamma(alpha)[:, np.newaxis])).sum(axis=1)
+            denominator = (length_histogram * (digamma(lengths + alpha.sum()) - digamma(alpha.sum()))).sum()
+            # a topic that is not assigned to any word keeps a small positive alpha.
+            new_alpha = np.maximum(alpha * numerator / denominator, 1e-6)
+            converged = np.all(np.abs(new_alpha - alpha) < tolerance * alpha)
+            alpha = new_alpha
+            if converged:
+                break
+            else:
+                pass
+        self.alpha = alpha
+        self.sum_alpha = float(sum(self.alpha.tolist()))
+        if optimize_beta == True:
+            # histogram, [n] refers the number of pairs of topic and term that are observed n times together.
+            positions = np.flatnonzero(self.topic_term_count_matrix.T)
+            term_histogram = np.bincount(self.topic_term_count_matrix.T.ravel()[positions])[1:]
+            numbers = np.arange(1, len(term_histogram) + 1, 1, dtype=np.float64)
+            topic_counts = np.asarray(self.sum_topic_by_term_count, dtype=np.float64)
+            old_beta = beta = float(self.beta[0])
+            for iteration_index in range(0, iteration_number, 1):
+                numerator = (term_histogram * (digamma(numbers + beta) - digamma(beta))).sum()
+                denominator = self.term_number * (digamma(topic_counts + self.term_number * beta) -
+                                                  digamma(self.term_number * beta)).sum()
+                new_beta = max(beta * numerator / denominator, 1e-6)
+                converged = abs(new_beta - beta) < tolerance * beta
+                beta = new_beta
+                if converged:
+                    break
+                else:
+                    pass
+            # the accumulated smoothing part is multiplied by beta in get_distribution, so it is scaled to keep the
+            # updates that were made with the old beta.
+            self.topic_smoothing_sum *= old_beta / beta
+            self.beta = np.full(self.term_number, beta, dtype=np.float64)
+            self.sum_beta = float(sum(self.beta.tolist()))
+        else:
+            pass
+        # the tables of log gamma are cached for the old parameters.
+        self.log_gamma_tables = {}
+        logger.info('hyperparameters: sum of alpha: %s beta: %s', self.sum_alpha, float(self.beta[0]))
+
+    def log_gamma_ratio(self, base, counts):
+        """
+        The method that calculates lgamma(base + n) - lgamma(base) for counts n, from a table that is cached for each
+        base and grows when larger counts are met. The table is the cumulative sum of log(base + i).
+        :param base: a positive number.
+        :param counts: an numpy array of non-negative integers.
+        :return: an numpy array of the same shape as counts.
+        """
+        base = float(base)
+        table = self.log_gamma_tables.get(base, np.zeros(0, dtype=np.float64))
+        size = int(counts.max()) + 1 if counts.size > 0 else 1
+        if len(table) < size:
+            size = max(size, 2 * len(table), 256)
+            table = np.zeros(size, dtype=np.float64)
+            np.cumsum(np.log(base + np.arange(0, size - 1, 1, dtype=np.float64)), out=table[1:])
+            self.log_gamma_tables[base] = table
+        else:
+            pass
+        return table[counts]
+
+    def sum_log_gamma_ratio(self, bases, counts):
+        """
+        The method that calculates the sum of lgamma(bases[i] + counts[i]) - lgamma(bases[i]), with one cached table
+        for each distinct base.
+        :param bases: an numpy array of positive numbers.
+        :param counts: an numpy array of non-negative integers of the same shape.
+        :return: the sum.
+        """
+        values, inverse = np.unique(bases, return_inverse=True)
+        if len(values) == 1:
+            return float(self.log_gamma_ratio(values[0], counts).sum())
+        else:
+            pass
+        result = 0.0
+        for index in range(0, len(values), 1):
+            result += float(self.log_gamma_ratio(values[index], counts[inverse == index]).sum())
+        return result
+
+    def log_likelihood(self):
+        """
+        The method that calculates the joint log likelihood of words and topics, log p(w, z), of the current state:
+            sum_k [sum_t lgamma(n_kt + beta[t]) - lgamma(beta[t])] - [lgamma(n_k + sum_beta) - lgamma(sum_beta)]
+          + sum_m [sum_k lgamma(n_mk + alpha[k]) - lgamma(alpha[k])] - [lgamma(n_m + sum_alpha) - lgamma(sum_alpha)]
+        The terms of zero counts are zero, so only the nonzero counts are read.
+        :return: the log likelihood.
+        """
+        # positions of nonzero counts in the column-major counter, [t * K + k].
+        positions = np.flatnonzero(self.topic_term_count_matrix.T)
+        counts = self.topic_term_count_matrix.T.ravel()[positions]
+        log_likelihood = self.sum_log_gamma_ratio(self.beta[positions // self.topic_number], counts)
+        for count in self.sum_topic_by_term_count.tolist():
+            log_likelihood -= math.lgamma(count + self.sum_beta) - math.lgamma(self.sum_beta)
+        documents, topics = np.nonzero(self.document_topic_count_matrix)
+        log_likelihood += self.sum_log_gamma_ratio(self.alpha[topics],
+                                                   self.document_topic_count_matrix[documents, topics])
+        lengths = np.asarray(self.sum_document_by_topic_count, dtype=np.int64)
+        log_likelihood -= float(self.log_gamma_ratio(self.sum_alpha, lengths).sum())
+        return log_likelihood
+
+    def perplexity(self, documents, iteration_number=20):
+        """
+        The method that calculates the perplexity of held out documents under the distribution of topics over terms
+        of the current state, by document completion: the distribution of each document over topics is inferred from
+        its words at even positions, and the words at odd positions are predicted. Only the terms of the documents are
+        read from the counters. The random state of the sampler is restored afterwards, so the chain is not changed.
+        :param documents: list of documents, each of which is a list of id of words.
+        :param iteration_number: number of iterations of inferring. Default value is 20.
+        :return: the perplexity, exp(- log likelihood of the predicted words / number of the predicted words).
+        """
+        documents = [np.asarray(document, dtype=np.int64) for document in documents]
+        terms = np.unique(np.concatenate(documents)) if len(documents) > 0 else np.zeros(0, dtype=np.int64)
+        if len(terms) == 0:
+            return float('nan')
+        else:
+            pass
+        # distribution of topics over the terms of the documents, [k][local id of t].
+        topic_term = ((self.topic_term_count_matrix[:, terms] + self.beta[terms]) /
+                      (self.sum_topic_by_term_count + self.sum_beta)[:, np.newaxis])
+        documents = [np.searchsorted(terms, document) for document in documents]
+        random_state = random.getstate()
+        inferencer = Inferencer(topic_distribution_over_term=topic_term, alpha=self.alpha)
+        document_topic = inferencer.infer(documents=[document[0::2] for document in documents],
+                                          iteration_number=iteration_number)
+        random.setstate(random_state)
+        log_likelihood = 0.0
+        word_number = 0
+        for m in range(0, len(documents), 1):
+            predicted = documents[m][1::2]
+            log_likelihood += float(np.log(document_topic[m].dot(topic_term[:, predicted])).sum())
+            word_number += len(predicted)
+        return math.exp(- log_likelihood / max(word_number, 1))
+
+    def save_checkpoint(self, checkpoint_file, iteration_number):
+        """
+        The method that saves the state of sampler to an uncompressed numpy .npz file. The state is written to a
+        temporary file that is renamed to checkpoint_file when it is complete, so an interrupted write never replaces
+        the last checkpoint.
+        :param checkpoint_file: the file where the state is saved.
+        :param iteration_number: number of iterations that have been done.
+        :return: Nothing.
+        """
+        temporary_file = checkpoint_file + '.tmp'
+        file = open(temporary_file, 'wb')
+        np.savez(file, iteration_number=iteration_number, update_number=self.update_number,
+                 random_state=np.frombuffer(cPickle.dumps(random.getstate(), 2), dtype=np.uint8),
+                 alpha=self.alpha, beta=self.beta,
+                 word_topic_assignment=self.word_topic_assignment,
+                 document_topic_count_matrix=self.document_topic_count_matrix,
+                 topic_term_count_matrix=self.topic_term_count_matrix,
+                 sum_document_by_topic_count=self.sum_document_by_topic_count,
+                 sum_topic_by_term_count=self.sum_topic_by_term_count,
+                 document_distribution_sum=self.document_distribution_sum,
+                 topic_term_weight_sum=self.topic_term_weight_sum,
+                 topic_smoothing_sum=self.topic_smoothing_sum)
+        file.close()
+        if os.path.exists(checkpoint_file) and sys.platform.startswith('win'):
+            os.remove(checkpoint_file)
+        else:
+            pass
+        os.rename(temporary_file, checkpoint_file)
+
+    def load_checkpoint(self, checkpoint_file):
+        """
+        The method that restores the state of sampler saved by save_checkpoint, including the state of random number
+        generator.
+        :param checkpoint_file: the file where the state is saved.
+        :return: number of iterations that had been done when the state was saved.
+        """
+        checkpoint = np.load(checkpoint_file)
+        if checkpoint['word_topic_assignment'].shape != (len(self.tokens),) or \
+                checkpoint['topic_term_count_matrix'].shape != (self.topic_number, self.term_number):
+            raise ValueError('checkpoint does not match the corpus or the number of topics: ' + checkpoint_file)
+        else:
+            pass
+        self.alpha = checkpoint['alpha']
+        self.beta = checkpoint['beta']
+        self.sum_alpha = float(sum(self.alpha.tolist()))
+        self.sum_beta = float(sum(self.beta.tolist()))
+        self.word_topic_assignment = checkpoint['word_topic_assignment']
+        self.document_topic_count_matrix = checkpoint['document_topic_count_matrix']
+        self.topic_term_count_matrix = np.asfortranarray(checkpoint['topic_term_count_matrix'])
+        self.sum_document_by_topic_count = checkpoint['sum_document_by_topic_count']
+        self.sum_topic_by_term_count = checkpoint['sum_topic_by_term_count']
+        self.document_distribution_sum = checkpoint['document_distribution_sum']
+        self.topic_term_weight_sum = np.asfortranarray(checkpoint['topic_term_weight_sum'])
+        self.topic_smoothing_sum = checkpoint['topic_smoothing_sum']
+        self.update_number = float(checkpoint['update_number'])
+        random.setstate(cPickle.loads(checkpoint['random_state'].tostring()))
+        iteration_number = int(checkpoint['iteration_number'])
+        checkpoint.close()
+        return iteration_number
+
+    def sweep(self):
+        """
+        The method that changes the state of all words in all documents once, according to their full conditional
+        probability.
+        :return: Nothing.
+        """
+        self.sample_documents(document_list=range(0, self.document_number, 1))
+
+    def sample_documents(self, document_list):
+        """
+        The method that changes the state of all words in some documents once.
+        :param document_list: list of id of documents.
+        :return: Nothing.
+        """
+        if self.topic_number < self.list_kernel_topics:
+            self.sample_documents_by_lists(document_list=document_list)
+        else:
+            for m in document_list:
+                self.sample_document(m=m)
+
+    def sample_documents_by_lists(self, document_list):
+        """
+        The method that changes the state of all words in some documents once, as sample_document does, but with the
+        counters copied to Python lists. For a few topics, a loop over a list is several times faster than the numpy
+        operations on short arrays of every word. The floating point operations are the same as sample_document, so
+        the chain is the same. Only the counts of the terms that occur in the documents are copied, and they are copied
+        back when all documents have been sampled, so the cost does not depend on the size of the vocabulary.
+        :param document_list: list of id of documents.
+        :return: Nothing.
+        """
+        document_list = list(document_list)
+        offsets = self.document_offsets
+        indices = np.asarray(document_list, dtype=np.int64)
+        lengths = offsets[indices + 1] - offsets[indices]
+        if lengths.sum() < self.term_number:
+            # the terms that occur in the documents, and the words numbered by their positions in terms, where the words
+            # of document document_list[i] begin at positions[i].
+            terms, words = np.unique(self.document_words(document_list), return_inverse=True)
+            positions = np.concatenate([[0], lengths.cumsum()[:-1]]).astype(np.int64)
+        else:
+            # the documents have more words than there are terms, so the counts of all terms are copied.
+            terms = np.arange(0, self.term_number, 1)
+            words = self.tokens
+            positions = offsets[indices]
+        # [i] refers to the list of the counts of term terms[i] over all topics.
+        term_topic_count = self.topic_term_count_matrix.T[terms].tolist()
+        topic_count = self.sum_topic_by_term_count.tolist()
+        alpha = self.alpha.tolist()
+        beta = self.beta[terms].tolist()
+        sum_alpha = self.sum_alpha
+        sum_beta = self.sum_beta
+        topic_number = self.topic_number
+        topic_range = range(0, topic_number, 1)
+        uniform = random.uniform
+        # [k] refers to the denominator of phi of topic k, which is updated when the count of topic k changes.
+        denominator = [topic_count[k] + sum_beta for k in topic_range]
+        for m, position in zip(document_list, positions.tolist()):
+            start = int(offsets[m])
+            end = int(offsets[m + 1])
+            document = words[position:position + end - start].tolist()
+            topics = self.word_topic_assignment[start:end].tolist()
+            document_count = self.document_topic_count_matrix[m].tolist()
+            theta_denominator = (len(document) - 1) + sum_alpha
+            # [k] refers to theta of topic k, which is updated when the count of topic k in the document changes.
+            theta = [(document_count[k] + alpha[k]) / theta_denominator for k in topic_range]
+            for n in range(0, len(document), 1):
+                term = document[n]
+                topic = topics[n]
+                term_count = term_topic_count[term]
+                # each counter minus one respectively.
+                document_count[topic] -= 1
+                term_count[topic] -= 1
+                topic_count[topic] -= 1
+                denominator[topic] = topic_count[topic] + sum_beta
+                theta[topic] = (document_count[topic] + alpha[topic]) / theta_denominator
+                # cumulating the full conditional distribution of this word over all topics.
+                beta_term = beta[term]
+                cumulative = []
+                append = cumulative.append
+                total = 0.0
+                for k in topic_range:
+                    total += (term_count[k] + beta_term) / denominator[k] * theta[k]
+                    append(total)
+                # get new topic according to the full conditional distribution.
+                new_topic = bisect_right(cumulative, uniform(0, 1) * total)
+                if new_topic < topic_number:
+                    topic = new_topic
+                else:
+                    pass
+                # each counter adds one respectively.
+                document_count[topic] += 1
+                term_count[topic] += 1
+                topic_count[topic] += 1
+                denominator[topic] = topic_count[topic] + sum_beta
+                theta[topic] = (document_count[topic] + alpha[topic]) / theta_denominator
+                topics[n] = topic
+            self.word_topic_assignment[start:end] = topics
+            self.document_topic_count_matrix[m] = document_count
+        if len(terms) > 0:
+            self.topic_term_count_matrix.T[terms] = term_topic_count
+        else:
+            pass
+        self.sum_topic_by_term_count[:] = topic_count
+
+    def document_words(self, document_list):
+        """
+        The method that gets the id of all words of some documents, one document after another.
+        :param document_list: list of id of documents.
+        :return: numpy array of id of words.
+        """
+        if len(document_list) > 0:
+            return np.concatenate([self.tokens[self.document_offsets[m]:self.document_offsets[m + 1]]
+                                   for m in document_list])
+        else:
+            return np.zeros(0, dtype=np.int32)
+
+    def sample_document(self, m):
+        """
+        The method that changes topics assigned to all words of document m, one word after another. It does the same as
+        calling sample_by_full_condition for each word, but the arrays used by every word are looked up only once.
+        :param m: document m.
+        :return: Nothing.
+        """
+        start = self.document_offsets[m]
+        end = self.document_offsets[m + 1]
+        document = self.tokens[start:end].tolist()
+        topics = self.word_topic_assignment[start:end].tolist()
+        document_topic_count = self.document_topic_count_matrix[m]
+        topic_term_count = self.topic_term_count_matrix
+        sum_topic_by_term_count = self.sum_topic_by_term_count
+        alpha = self.alpha
+        beta = self.beta
+        sum_beta = self.sum_beta
+        uniform = random.uniform
+        # the number of words in document m is constant, so is the denominator of theta when one word is left out.
+        theta_denominator = (len(document) - 1) + self.sum_alpha
+        for n in range(0, len(document), 1):
+            term = document[n]
+            topic = topics[n]
+            # each counter minus one respectively.
+            document_topic_count[topic] -= 1
+            topic_term_count[topic, term] -= 1
+            sum_topic_by_term_count[topic] -= 1
+            # full conditional distribution of this word over all topics.
+            probability = (topic_term_count[:, term] + beta[term]) / (sum_topic_by_term_count + sum_beta)
+            probability *= (document_topic_count + alpha) / theta_denominator
+            cumulative = probability.cumsum()
+            # get new topic according to the full conditional distribution.
+            new_topic = cumulative.searchsorted(uniform(0, 1) * cumulative[-1], side='right')
+            if new_topic < self.topic_number:
+                topic = int(new_topic)
+            else:
+                pass
+            # each counter adds one respectively.
+            document_topic_count[topic] += 1
+            topic_term_count[topic, term] += 1
+            sum_topic_by_term_count[topic] += 1
+            topics[n] = topic
+        self.word_topic_assignment[start:end] = topics
 
     def sample_by_full_condition(self, m, n):
         """
@@ -100,40 +629,34 @@ class GibbsSampler(object):
         :param n: sequence of word in document m.
         :return: Nothing.
         """
+        index = self.document_offsets[m] + n
+        term = self.tokens[index]
         # topic assigned to this word before.
-        topic = self.word_topic_assignment[m][n]
+        topic = self.word_topic_assignment[index]
         # each counter of the four counters minus one respectively.
-        self.document_topic_count_matrix[m][topic] -= 1.0
-        self.topic_term_count_matrix[topic][self.documents[m][n]] -= 1.0
-        self.sum_document_by_topic_count[m] -= 1.0
-        self.sum_topic_by_term_count[topic] -= 1.0
-
-        # full conditional distribution of this word.
-        full_condition_probability = []
-        for k in range(0, self.topic_number, 1):
-            phi = (self.topic_term_count_matrix[k][self.documents[m][n]] + self.beta[self.documents[m][n]]) /\
-                  (self.sum_topic_by_term_count[k] + self.sum_beta)
-            theta = (self.document_topic_count_matrix[m][k] + self.alpha[k]) /\
-                    (self.sum_document_by_topic_count[m] + self.sum_alpha)
-            probability = phi * theta
-            full_condition_probability.append(probability)
+        self.document_topic_count_matrix[m, topic] -= 1
+        self.topic_term_count_matrix[topic, term] -= 1
+        self.sum_document_by_topic_count[m] -= 1
+        self.sum_topic_by_term_count[topic] -= 1
+
+        # full conditional distribution of this word, computed for all topics at once.
+        phi = (self.topic_term_count_matrix[:, term] + self.beta[term]) / (self.sum_topic_by_term_count + self.sum_beta)
+        theta = (self.document_topic_count_matrix[m] + self.alpha) / (self.sum_document_by_topic_count[m] +
+                                                                      self.sum_alpha)
         # cumulating the full conditional distribution.
-        for index in range(1, len(full_condition_probability), 1):
-            full_condition_probability[index] += full_condition_probability[index-1]
+        cumulative = (phi * theta).cumsum()
         # get new topic according to the full conditional distribution.
-        random_double = random.uniform(0,1) * full_condition_probability[-1]
-        for index in range(0, len(full_condition_probability),1):
-            if random_double < full_condition_probability[index]:
-                topic = index
-                break
-            else:
-                pass
+        new_topic = cumulative.searchsorted(random.uniform(0, 1) * cumulative[-1], side='right')
+        if new_topic < self.topic_number:
+            topic = new_topic
+        else:
+            pass
         # each counter of the four counters adds one respectively.
-        self.document_topic_count_matrix[m][topic] += 1.0
-        self.topic_term_count_matrix[topic][self.documents[m][n]] += 1.0
-        self.sum_document_by_topic_count[m] += 1.0
-        self.sum_topic_by_term_count[topic] += 1.0
-        self.word_topic_assignment[m][n] = topic
+        self.document_topic_count_matrix[m, topic] += 1
+        self.topic_term_count_matrix[topic, term] += 1
+        self.sum_document_by_topic_count[m] += 1
+        self.sum_topic_by_term_count[topic] += 1
+        self.word_topic_assignment[index] = topic
 
     def initialize(self):
         """
@@ -142,71 +665,245 @@ class GibbsSampler(object):
         :return: Nothing.
         """
         # Initializing the counter and distribution.
-        for k in range(0, self.topic_number,1):
-            self.topic_term_count_matrix[k]= [0.0] * self.term_number
-            self.topic_distribution_over_term[k] = [0.0] * self.term_number
-            self.sum_topic_by_term_count[k] = 0.0
-        for m in range(0, self.document_number,1):
-            self.document_topic_count_matrix[m] = [0.0] * self.topic_number
-            self.document_distribution_over_topic[m] = [0.0] * self.topic_number
-            self.sum_document_by_topic_count[m] = 0.0
+        self.topic_term_count_matrix = np.zeros((self.topic_number, self.term_number), dtype=np.int32, order='F')
+        self.sum_topic_by_term_count = np.zeros(self.topic_number, dtype=np.int32)
+        self.document_topic_count_matrix = np.zeros((self.document_number, self.topic_number), dtype=np.int32)
+        self.sum_document_by_topic_count = np.zeros(self.document_number, dtype=np.int32)
+        self.document_distribution_sum = np.zeros((self.document_number, self.topic_number), dtype=np.float64)
+        self.topic_term_weight_sum = np.zeros((self.topic_number, self.term_number), dtype=np.float64, order='F')
+        self.topic_smoothing_sum = np.zeros(self.topic_number, dtype=np.float64)
+        self.update_number = 0.0
 
         # Initializing topics assigned to all words of all documents.
-        for m in range(0, self.document_number, 1):
-            N = len(self.documents[m])
-            self.word_topic_assignment[m] = [-1] * N
-            for n in range(0, N,1):
-                topic = int(random.uniform(0,1) * self.topic_number)
-                self.document_topic_count_matrix[m][topic] += 1.0
-                self.topic_term_count_matrix[topic][self.documents[m][n]] += 1.0
-                self.sum_topic_by_term_count[topic] += 1.0
-                self.word_topic_assignment[m][n] = topic
-            self.sum_document_by_topic_count[m] = N
+        self.word_topic_assignment = np.empty(len(self.tokens), dtype=np.int32)
+        for index in range(0, len(self.tokens), 1):
+            self.word_topic_assignment[index] = int(random.uniform(0,1) * self.topic_number)
+        # the counters are built from the assignments of all words at once.
+        lengths = np.diff(self.document_offsets)
+        document_index = np.repeat(np.arange(self.document_number, dtype=np.int64), lengths)
+        self.document_topic_count_matrix[:] = np.bincount(
+            document_index * self.topic_number + self.word_topic_assignment,
+            minlength=self.document_number * self.topic_number).reshape(self.document_number, self.topic_number)
+        # [t * K + k] is the position of [k][t] in the column-major counter.
+        self.topic_term_count_matrix.T[:] = np.bincount(
+            self.tokens.astype(np.int64) * self.topic_number + self.word_topic_assignment,
+            minlength=self.term_number * self.topic_number).reshape(self.term_number, self.topic_number)
+        self.sum_document_by_topic_count[:] = lengths
+        self.sum_topic_by_term_count[:] = self.topic_term_count_matrix.sum(axis=1)
+
+    def add_documents(self, corpus, beta=None):
+        """
+        The method that extends the state of Markov Chain to the documents and terms that have been added to the corpus
+        since the sampler was created. The new terms are appended to all counters, and the words of the new documents
+        are assigned random topics as initialize does. The other words keep their topics.
+        :param corpus: the instance of class: Corpus that the sampler was created with.
+        :param beta: parameter of LDA for the new terms. Default value is None, which means the same as the last term.
+        :return: list of id of the new documents.
+        """
+        old_document_number = self.document_number
+        old_term_number = self.term_number
+        old_token_number = len(self.word_topic_assignment)
+        self.documents = corpus.documents
+        self.tokens = corpus.token_array()
+        self.document_offsets = corpus.offset_array()
+        self.document_number = len(self.document_offsets) - 1
+        self.term_number = len(corpus.word_id)
+        # the new terms.
+        new_term_number = self.term_number - old_term_number
+        if new_term_number > 0:
+            if beta == None:
+                beta = float(self.beta[-1]) if old_term_number > 0 else 0.1
+            else:
+                pass
+            old_sum_beta = self.sum_beta
+            self.beta = np.concatenate([self.beta, np.full(new_term_number, beta, dtype=np.float64)])
+            self.sum_beta = float(sum(self.beta.tolist()))
+            # the accumulated smoothing part is multiplied by the longer beta in get_distribution, so it is scaled to
+            # keep the topics of the old updates normalized, as optimize_hyperparameters does.
+            self.topic_smoothing_sum *= old_sum_beta / self.sum_beta
+            # the counters are column-major, so new columns are new rows of their transposes.
+            self.topic_term_count_matrix = np.concatenate(
+                [self.topic_term_count_matrix.T, np.zeros((new_term_number, self.topic_number), dtype=np.int32)]).T
+            self.topic_term_weight_sum = np.concatenate(
+                [self.topic_term_weight_sum.T, np.zeros((new_term_number, self.topic_number))]).T
+        else:
+            pass
+        # the words of the new documents.
+        new_topics = np.empty(len(self.tokens) - old_token_number, dtype=np.int32)
+        for index in range(0, len(new_topics), 1):
+            new_topics[index] = int(random.uniform(0,1) * self.topic_number)
+        self.word_topic_assignment = np.concatenate([self.word_topic_assignment, new_topics])
+        lengths = np.diff(self.document_offsets[old_document_number:])
+        document_index = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        new_document_topic_count = np.bincount(document_index * self.topic_number + new_topics,
+                                               minlength=len(lengths) * self.topic_number)
+        self.document_topic_count_matrix = np.concatenate(
+            [self.document_topic_count_matrix,
+             new_document_topic_count.reshape(len(lengths), self.topic_number).astype(np.int32)])
+        self.sum_document_by_topic_count = np.concatenate([self.sum_document_by_topic_count,
+                                                           lengths.astype(np.int32)])
+        np.add.at(self.topic_term_count_matrix, (new_topics, self.tokens[old_token_number:]), 1)
+        self.sum_topic_by_term_count += np.bincount(new_topics, minlength=self.topic_number).astype(np.int32)
+        self.document_distribution_sum = np.concatenate([self.document_distribution_sum,
+                                                         np.zeros((len(lengths), self.topic_number))])
+        return range(old_document_number, self.document_number, 1)
+
+    def sample_new_documents(self, document_list, iteration_number=50, burn_in=None, refresh_number=None):
+        """
+        The method that samples some documents, usually the ones added by add_documents, for a number of iterations and
+        calculates the distributions again. In each iteration, refresh_number of the other documents are also sampled,
+        in turn, so that their topics follow the changed counters.
+        The samples of this update are added to the accumulators, so the distributions of the other documents and of
+        the topics are still averaged over all samples of the training, in which the new terms had no words. The
+        distributions of the new documents, which had no samples before, are averaged over the samples of this update.
+        The counts of a document or a term only change when it is sampled, so the samples in which they did not change
+        are added to its accumulator at once, before it is sampled again and at the end, see add_constant_samples. The
+        cost of an iteration is proportional to the number of words in the sampled documents, and only calculating the
+        distributions at the end reads the counters of the whole corpus.
+        :param document_list: list of id of documents.
+        :param iteration_number: number of iterations.
+        :param burn_in: number of "burn in" iterations, after which the distributions are updated every iteration.
+                        Default value is None, which means half of iteration_number.
+        :param refresh_number: number of other documents sampled in each iteration. Default value is None, which means
+                               as many as len(document_list).
+        :return: Nothing.
+        """
+        if burn_in == None:
+            burn_in = iteration_number // 2
+        else:
+            pass
+        if refresh_number == None:
+            refresh_number = len(document_list)
+        else:
+            pass
+        document_list = list(document_list)
+        other_documents = np.setdiff1d(np.arange(0, self.document_number, 1), document_list)
+        refresh_number = min(refresh_number, len(other_documents))
+        old_update_number = self.update_number
+        # [u] refers to topic_smoothing_sum after u updates of this call.
+        smoothing_history = [self.topic_smoothing_sum.copy()]
+        # [t] and [m] refer to the number of updates of this call that have been added to the accumulators of term t
+        # and document m.
+        term_updates = np.zeros(self.term_number, dtype=np.int64)
+        document_updates = np.zeros(self.document_number, dtype=np.int64)
+        for iteration_index in range(0, iteration_number, 1):
+            positions = (self.refresh_position + np.arange(0, refresh_number, 1)) % max(len(other_documents), 1)
+            sampled_list = document_list + other_documents[positions].tolist()
+            self.refresh_position = (self.refresh_position + refresh_number) % max(len(other_documents), 1)
+            if len(smoothing_history) > 1:
+                # the counts of the sampled documents and terms are going to change.
+                self.add_constant_samples(sampled_list, np.unique(self.document_words(sampled_list)),
+                                          smoothing_history, document_updates, term_updates)
+            else:
+                pass
+            self.sample_documents(document_list=sampled_list)
+            if iteration_index >= burn_in:
+                # the smoothing part is added to all topics, and the other parts are added by add_constant_samples.
+                self.topic_smoothing_sum += 1.0 / (self.sum_topic_by_term_count + self.sum_beta)
+                self.update_number += 1
+                smoothing_history.append(self.topic_smoothing_sum.copy())
+            else:
+                pass
+        if len(smoothing_history) > 1:
+            self.add_constant_samples(None, None, smoothing_history, document_updates, term_updates)
+        else:
+            pass
+        new_update_number = self.update_number - old_update_number
+        if old_update_number > 0 and new_update_number > 0:
+            # the sums of the new documents only have the samples of this update, so they are scaled to the number of
+            # all samples.
+            self.document_distribution_sum[document_list] *= self.update_number / new_update_number
+        elif old_update_number > 0:
+            # no sample of this update, the new documents take the distributions of the current state.
+            self.document_distribution_sum[document_list] = \
+                self.update_number * (self.document_topic_count_matrix[document_list] + self.alpha) / \
+                (self.sum_document_by_topic_count[document_list] + self.sum_alpha)[:, np.newaxis]
+        else:
+            pass
+        self.get_distribution()
+
+    def add_constant_samples(self, document_list, terms, smoothing_history, document_updates, term_updates):
+        """
+        The method that adds the samples of sample_new_documents in which the counts of some documents and terms did
+        not change to their accumulators, as update_distribution would have added them one by one. The part of term t
+        in topic k of update u is n_kt / (n_k + sum_beta) of update u, so the sum over the updates in which n_kt did not
+        change is n_kt times the change of topic_smoothing_sum.
+        :param document_list: list of id of documents, or None, which means all documents.
+        :param terms: numpy array of id of terms, or None, which means all terms.
+        :param smoothing_history: list of topic_smoothing_sum after every update of sample_new_documents.
+        :param document_updates: an numpy array, [m] refers to the number of updates that have been added to document
+                                 m, which is set to the number of all updates.
+        :param term_updates: an numpy array, [t] refers to the number of updates that have been added to term t, which is
+                             set to the number of all updates.
+        :return: Nothing.
+        """
+        update_number = len(smoothing_history) - 1
+        # [u][k] refers to the sum of 1 / (n_k + sum_beta) over the updates after the u th one.
+        smoothing_change = smoothing_history[-1] - np.array(smoothing_history)
+        if document_list == None:
+            self.document_distribution_sum += (update_number - document_updates)[:, np.newaxis] * \
+                (self.document_topic_count_matrix + self.alpha) / \
+                (self.sum_document_by_topic_count + self.sum_alpha)[:, np.newaxis]
+            document_updates[:] = update_number
+            # positions of nonzero counts in the column-major counter, [t * K + k].
+            positions = np.flatnonzero(self.topic_term_count_matrix.T)
+            self.topic_term_weight_sum.T.ravel()[positions] += self.topic_term_count_matrix.T.ravel()[positions] * \
+                smoothing_change[term_updates[positions // self.topic_number], positions % self.topic_number]
+            term_updates[:] = update_number
+        else:
+            self.document_distribution_sum[document_list] += \
+                (update_number - document_updates[document_list])[:, np.newaxis] * \
+                (self.document_topic_count_matrix[document_list] + self.alpha) / \
+                (self.sum_document_by_topic_count[document_list] + self.sum_alpha)[:, np.newaxis]
+            document_updates[document_list] = update_number
+            self.topic_term_weight_sum[:, terms] += self.topic_term_count_matrix[:, terms] * \
+                smoothing_change[term_updates[terms]].T
+            term_updates[terms] = update_number
 
     def update_distribution(self):
         """
-        The method that updates distributions according to the four counters.
+        The method that adds the distributions of the current state to the accumulators. The distribution of topics
+        over terms is only accumulated where the count is not zero, and its smoothing part per topic.
         :return: Nothing.
         """
-        for m in range(0, self.document_number, 1):
-            for k in range(0, self.topic_number, 1):
-                self.document_distribution_over_topic[m][k]+=((self.document_topic_count_matrix[m][k] + self.alpha[k])
-                                                              / (self.sum_document_by_topic_count[m] + self.sum_alpha))
-        for k in range(0, self.topic_number, 1):
-            for v in range(0, self.term_number,1):
-                self.topic_distribution_over_term[k][v] += ((self.topic_term_count_matrix[k][v] + self.beta[v]) / \
-                                                            (self.sum_topic_by_term_count[k] + self.sum_beta))
+        self.document_distribution_sum += ((self.document_topic_count_matrix + self.alpha) /
+                                           (self.sum_document_by_topic_count + self.sum_alpha)[:, np.newaxis])
+        reciprocal = 1.0 / (self.sum_topic_by_term_count + self.sum_beta)
+        # positions of nonzero counts in the column-major counter, [t * K + k].
+        positions = np.flatnonzero(self.topic_term_count_matrix.T)
+        topics = positions % self.topic_number
+        self.topic_term_weight_sum.T.ravel()[positions] += \
+            self.topic_term_count_matrix.T.ravel()[positions] * reciprocal[topics]
+        self.topic_smoothing_sum += reciprocal
         # the number of times that the distributions are updated.
         self.update_number += 1
 
     def get_distribution(self):
         """
-        The method that calculates final distribution.
+        The method that calculates final distribution, which is the average of the accumulated distributions, or the
+        distribution of the current state if the distributions have not been updated. The accumulators are not
+        changed, so it can be called at any time. The distributions are contiguous arrays of distribution_dtype.
         :return: Nonthing.
         """
-
+        self.document_distribution_over_topic = np.empty((self.document_number, self.topic_number),
+                                                         dtype=self.distribution_dtype)
+        self.topic_distribution_over_term = np.empty((self.topic_number, self.term_number),
+                                                     dtype=self.distribution_dtype)
         # If the distributions have been updated before.
         if self.update_number > 0:
-            for m in range(0, self.document_number, 1):
-                for k in range(0, self.topic_number,1):
-                    probability = self.document_distribution_over_topic[m][k] / self.update_number
-                    self.document_distribution_over_topic[m][k] = probability
-            for k in range(0, self.topic_number,1):
-                for v in range(0, self.term_number,1):
-                    probability = self.topic_distribution_over_term[k][v] / self.update_number
-                    self.topic_distribution_over_term[k][v] = probability
+            np.divide(self.document_distribution_sum, self.update_number, out=self.document_distribution_over_topic)
+            # topic by topic, so that no float64 matrix of the size of the distribution is allocated.
+            for k in range(0, self.topic_number, 1):
+                self.topic_distribution_over_term[k] = \
+                    (self.topic_term_weight_sum[k] + self.topic_smoothing_sum[k] * self.beta) / self.update_number
         # The distributions have not been updated once.
         else:
-            for m in range(0, self.document_number, 1):
-                for k in range(0, self.topic_number, 1):
-                    self.document_distribution_over_topic[m][k] = (
-                    (self.document_topic_count_matrix[m][k] + self.alpha[k]) / (
-                    self.sum_document_by_topic_count[m] + self.sum_alpha))
+            np.divide(self.document_topic_count_matrix + self.alpha,
+                      (self.sum_document_by_topic_count + self.sum_alpha)[:, np.newaxis],
+                      out=self.document_distribution_over_topic)
             for k in range(0, self.topic_number, 1):
-                for v in range(0, self.term_number, 1):
-                    self.topic_distribution_over_term[k][v] = (
-                    (self.topic_term_count_matrix[k][v] + self.beta[v]) / (
-                    self.sum_topic_by_term_count[k] + self.sum_beta))
+                self.topic_distribution_over_term[k] = \
+                    (self.topic_term_count_matrix[k] + self.beta) / (self.sum_topic_by_term_count[k] + self.sum_beta)
 
     def get_topic_distribution_over_term(self):
         """
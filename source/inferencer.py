@@ -0,0 +1,94 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the class: Inferencer, which infers the distribution of unseen documents over topics.
+"""
+import sys
+import random
+import numpy as np
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class Inferencer(object):
+    """
+    The class, which infers the distribution of new documents over topics by Gibbs Sampling against a trained model
+    (fold-in). The distribution of topics over terms is fixed, so the full conditional probability of a word w in
+    document m is
+        phi[k][w] * (n_mk + alpha[k])
+    and the documents are independent. The n th words of all documents of a batch are sampled at once.
+    """
+    def __init__(self, topic_distribution_over_term, alpha):
+        """
+        The method that initializes an instance of the class.
+        :param topic_distribution_over_term: the trained distribution of topics over terms, an K * V array.
+        :param alpha: an vector, parameter of LDA, whose length is equal to the number of topics.
+        """
+        self.topic_distribution_over_term = topic_distribution_over_term
+        self.topic_number = len(alpha)
+        self.alpha = np.asarray(alpha, dtype=np.float64)
+        self.sum_alpha = float(sum(self.alpha.tolist()))
+
+    def infer(self, documents, iteration_number=50, burn_in=None):
+        """
+        The method that infers the distribution of documents over topics.
+        :param documents: list of documents, each of which is a list of id of words in the document.
+        :param iteration_number: number of iterations of Gibbs Sampling.
+        :param burn_in: number of "burn in" iterations, after which the distribution is averaged over iterations.
+                        Default value is None, which means half of iteration_number.
+        :return: an numpy array, [m][k] refers the probability that assigning topic k to document m.
+        """
+        if burn_in == None:
+            burn_in = iteration_number // 2
+        else:
+            pass
+        document_number = len(documents)
+        lengths = np.array([len(document) for document in documents], dtype=np.int64)
+        max_length = int(lengths.max()) if document_number > 0 else 0
+        # the words of the batch as a padded matrix of ids in the local vocabulary of the batch, so that only the
+        # distribution of terms of the batch is gathered.
+        tokens = np.zeros((document_number, max_length), dtype=np.int64)
+        mask = np.arange(max_length) < lengths[:, np.newaxis]
+        if max_length > 0:
+            tokens[mask] = np.concatenate([np.asarray(document, dtype=np.int64) for document in documents])
+        else:
+            pass
+        terms, local_tokens = np.unique(tokens[mask], return_inverse=True)
+        tokens[mask] = local_tokens
+        # [t][k] refers the probability of local term t in topic k.
+        term_topic = np.ascontiguousarray(np.asarray(self.topic_distribution_over_term)[:, terms].T, dtype=np.float64)
+
+        random_state = np.random.RandomState(random.randint(0, 2 ** 31 - 1))
+        topics = random_state.randint(0, self.topic_number, size=(document_number, max_length))
+        document_topic_count = np.zeros((document_number, self.topic_number), dtype=np.int64)
+        document_index = np.repeat(np.arange(document_number), lengths)
+        np.add.at(document_topic_count, (document_index, topics[mask]), 1)
+        active_documents = [np.flatnonzero(mask[:, n]) for n in range(0, max_length, 1)]
+
+        document_distribution_over_topic = np.zeros((document_number, self.topic_number), dtype=np.float64)
+        update_number = 0
+        for iteration_index in range(0, iteration_number, 1):
+            for n in range(0, max_length, 1):
+                rows = active_documents[n]
+                topic = topics[rows, n]
+                document_topic_count[rows, topic] -= 1
+                probability = term_topic[tokens[rows, n]] * (document_topic_count[rows] + self.alpha)
+                cumulative = probability.cumsum(axis=1)
+                random_double = random_state.random_sample(len(rows)) * cumulative[:, -1]
+                topic = (cumulative <= random_double[:, np.newaxis]).sum(axis=1)
+                topic = np.minimum(topic, self.topic_number - 1)
+                document_topic_count[rows, topic] += 1
+                topics[rows, n] = topic
+            if iteration_index >= burn_in:
+                document_distribution_over_topic += document_topic_count
+                update_number += 1
+            else:
+                pass
+        if update_number == 0:
+            document_distribution_over_topic += document_topic_count
+            update_number = 1
+        else:
+            pass
+        document_distribution_over_topic = document_distribution_over_topic / update_number + self.alpha
+        document_distribution_over_topic /= (lengths + self.sum_alpha)[:, np.newaxis]
+        return document_distribution_over_topic
@@ -0,0 +1,290 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the class: Instrumentation, which measures the phases of training LDA model, and the loggers of
+all modules. The modules log to the logger 'LDA', which has no output until it is configured, for example by
+    logging.basicConfig(level=logging.INFO)
+"""
+import sys
+import gc
+import json
+import time
+import signal
+import logging
+import cProfile
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+logging.getLogger('LDA').addHandler(logging.NullHandler())
+
+
+def get_logger(name):
+    """
+    The function that gets the logger of a module, which is a child of the logger 'LDA'.
+    :param name: name of the module.
+    :return: an instance of class: logging.Logger.
+    """
+    return logging.getLogger('LDA.' + name)
+
+
+logger = get_logger('instrumentation')
+
+
+def memory_status(field):
+    """
+    The function that reads a field of /proc/self/status in kilobytes, which is only available on Linux.
+    :param field: name of the field, such as 'VmRSS' or 'VmHWM'.
+    :return: the value in kilobytes, or None if it is not available.
+    """
+    try:
+        file = open('/proc/self/status', 'r')
+        lines = file.readlines()
+        file.close()
+    except IOError:
+        return None
+    for line in lines:
+        if line.startswith(field + ':'):
+            return int(line.split()[1])
+    return None
+
+
+def allocation_count():
+    """
+    The function that counts the memory blocks allocated by Python, or the objects tracked by the garbage collector
+    where the former is not available (Python 2). The difference of two counts is the number of allocations that have
+    not been freed.
+    :return: the count.
+    """
+    if hasattr(sys, 'getallocatedblocks'):
+        return sys.getallocatedblocks()
+    else:
+        return len(gc.get_objects())
+
+
+class NullPhase(object):
+    """
+    The class of the phase that measures nothing, which is used when there is no instrumentation.
+    """
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exception_type, exception, traceback):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Phase(object):
+    """
+    The class of one measured phase, which is used by the statement: with. The record of the phase is a dict, in which
+    the code of the phase may set 'tokens', the number of words that it processed, and other statistics.
+    """
+    def __init__(self, instrumentation, name, tokens=None):
+        """
+        The method that initializes an instance of the class.
+        :param instrumentation: the instance of class: Instrumentation that the record is reported to.
+        :param name: name of the phase.
+        :param tokens: number of words that the phase processes. Default value is None.
+        """
+        self.instrumentation = instrumentation
+        self.record = {'phase': name, 'tokens': tokens}
+        self.start_time = None
+        self.start_allocations = None
+
+    def __enter__(self):
+        self.start_allocations = allocation_count() if self.instrumentation.count_allocations else None
+        self.instrumentation.start_phase(self.record['phase'])
+        self.start_time = time.time()
+        return self.record
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.record['seconds'] = time.time() - self.start_time
+        if self.start_allocations != None:
+            self.record['allocations'] = allocation_count() - self.start_allocations
+        else:
+            self.record['allocations'] = None
+        self.record['rss_kb'] = memory_status('VmRSS')
+        if self.record['tokens'] != None:
+            self.record['tokens_per_second'] = self.record['tokens'] / max(self.record['seconds'], 1e-9)
+        else:
+            self.record['tokens_per_second'] = None
+        self.instrumentation.finish_phase(self.record)
+        return False
+
+
+class Instrumentation(object):
+    """
+    The class, which measures the phases of training: 'ingest', 'initialize', 'sweep', 'update_distribution',
+    'get_distribution' and 'output'. The record of every phase, a dict of its name, seconds, tokens, tokens_per_second,
+    rss_kb and allocations, is passed to all hooks, and the totals of every phase are kept in summary.
+    It can also profile a number of consecutive phases of one name, the sweeps by default, by cProfile, or by sampling
+    the stack every few milliseconds, which slows the sampling much less and is only available on Unix. The profile of
+    the parallel sampler only covers the main process.
+    """
+    def __init__(self, hooks=None, count_allocations=False, profile_iterations=None, profile_mode='cprofile',
+                 profile_file='lda.profile', profile_phase='sweep', profile_interval=0.005):
+        """
+        The method that initializes an instance of the class.
+        :param hooks: list of functions, each of which is called with the record of every phase. Default value is
+                      None.
+        :param count_allocations: boolean value, whether to count the allocations of every phase, which walks all
+                                  objects of the heap twice a phase in Python 2. Default value is False, which means
+                                  the allocations of the records are None.
+        :param profile_iterations: number of phases that are profiled. Default value is None, which means no profile.
+        :param profile_mode: 'cprofile' or 'sampling'. Default value is 'cprofile'.
+        :param profile_file: the file where the profile is saved, the statistics of pstats for 'cprofile', or the
+                             number of samples of every function for 'sampling'. Default value is 'lda.profile'.
+        :param profile_phase: name of the phases that are profiled. Default value is 'sweep'.
+        :param profile_interval: seconds between two samples of the stack for 'sampling'. Default value is 0.005.
+        """
+        self.hooks = list(hooks) if hooks != None else []
+        self.count_allocations = count_allocations
+        self.profile_iterations = profile_iterations
+        self.profile_mode = profile_mode
+        self.profile_file = profile_file
+        self.profile_phase = profile_phase
+        self.profile_interval = profile_interval
+        # number of phases that have been profiled.
+        self.profiled_number = 0
+        # the profiler of 'cprofile', or the dict of samples of 'sampling', key: function, value: number of samples.
+        self.profiler = None
+        self.samples = None
+        # the handler of SIGPROF before the phase that is profiled by 'sampling', which is restored after it.
+        self.previous_handler = None
+        # the totals of every phase, key: name, value: dict of count, seconds and tokens.
+        self.summary = {}
+
+    def phase(self, name, tokens=None):
+        """
+        The method that measures a phase, which is used as
+            with instrumentation.phase('sweep', tokens=number_of_words) as record:
+                ...
+        :param name: name of the phase.
+        :param tokens: number of words that the phase processes. Default value is None.
+        :return: an instance of class: Phase.
+        """
+        return Phase(self, name, tokens)
+
+    def add_hook(self, hook):
+        """
+        The method that adds a hook, which is called with the record of every phase.
+        :param hook: the function.
+        :return: Nothing.
+        """
+        self.hooks.append(hook)
+
+    def start_phase(self, name):
+        """
+        The method that is called when a phase starts, which starts the profiler if the phase should be profiled.
+        :param name: name of the phase.
+        :return: Nothing.
+        """
+        if name == self.profile_phase and self.profile_iterations != None and \
+                self.profiled_number < self.profile_iterations:
+            if self.profile_mode == 'cprofile':
+                if self.profiler == None:
+                    self.profiler = cProfile.Profile()
+                else:
+                    pass
+                self.profiler.enable()
+            elif self.profile_mode == 'sampling':
+                if self.samples == None:
+                    self.samples = {}
+                else:
+                    pass
+                self.previous_handler = signal.signal(signal.SIGPROF, self.sample_stack)
+                signal.setitimer(signal.ITIMER_PROF, self.profile_interval, self.profile_interval)
+            else:
+                raise ValueError('unknown profile mode: ' + str(self.profile_mode))
+        else:
+            pass
+
+    def finish_phase(self, record):
+        """
+        The method that is called when a phase finishes. It stops the profiler and restores the handler of SIGPROF,
+        adds the record to the summary and passes it to the hooks.
+        :param record: the record of the phase.
+        :return: Nothing.
+        """
+        name = record['phase']
+        if name == self.profile_phase and self.profile_iterations != None and \
+                self.profiled_number < self.profile_iterations:
+            if self.profile_mode == 'cprofile':
+                self.profiler.disable()
+            else:
+                signal.setitimer(signal.ITIMER_PROF, 0, 0)
+                # a handler that was not set from Python can not be restored, so the default one is.
+                if self.previous_handler != None:
+                    signal.signal(signal.SIGPROF, self.previous_handler)
+                else:
+                    signal.signal(signal.SIGPROF, signal.SIG_DFL)
+                self.previous_handler = None
+            self.profiled_number += 1
+            if self.profiled_number == self.profile_iterations:
+                self.save_profile()
+            else:
+                pass
+        else:
+            pass
+        total = self.summary.setdefault(name, {'count': 0, 'seconds': 0.0, 'tokens': 0})
+        total['count'] += 1
+        total['seconds'] += record['seconds']
+        total['tokens'] += record['tokens'] if record['tokens'] != None else 0
+        logger.debug('phase: %s seconds: %.3f tokens/second: %s rss: %s kB allocations: %s', name, record['seconds'],
+                     record['tokens_per_second'], record['rss_kb'], record['allocations'])
+        for hook in self.hooks:
+            hook(record)
+
+    def sample_stack(self, signal_number, frame):
+        """
+        The method that is called by the signal of the timer of 'sampling', which counts the functions on the stack.
+        :param signal_number: the number of the signal.
+        :param frame: the frame that was running.
+        :return: Nothing.
+        """
+        functions = set()
+        while frame != None:
+            code = frame.f_code
+            functions.add((code.co_filename, code.co_firstlineno, code.co_name))
+            frame = frame.f_back
+        for function in functions:
+            self.samples[function] = self.samples.get(function, 0) + 1
+
+    def save_profile(self):
+        """
+        The method that saves the profile to profile_file.
+        :return: Nothing.
+        """
+        if self.profile_mode == 'cprofile':
+            self.profiler.dump_stats(self.profile_file)
+        else:
+            file = open(self.profile_file, 'wb')
+            for function, count in sorted(self.samples.iteritems(), key=lambda item: -item[1]):
+                file.write(str(count) + '\t' + function[2] + '\t' + function[0] + ':' + str(function[1]) + '\n')
+            file.close()
+        logger.info('profile of %d phases: %s is saved to: %s', self.profiled_number, self.profile_phase,
+                    self.profile_file)
+
+
+class JsonLinesHook(object):
+    """
+    The class of the hook that writes the record of every phase to a file, one json object per line.
+    """
+    def __init__(self, file_name):
+        """
+        The method that initializes an instance of the class.
+        :param file_name: the file that the records are appended to.
+        """
+        self.file = open(file_name, 'ab')
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record, sort_keys=True) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """
+        The method that closes the file.
+        :return: Nothing.
+        """
+        self.file.close()
@@ -7,8 +7,21 @@ The file that defines the class: LDA.
 import sys
 import os
 import csv
+import json
+import random
+import numpy as np
 from corpus import Corpus
+from corpus import write_files
 from gibbsSampler import GibbsSampler
+from sparseGibbsSampler import SparseGibbsSampler
+from parallelGibbsSampler import ParallelGibbsSampler
+from multipleChains import MultipleChains
+from modelSelection import ModelSelection
+from documentIndex import DocumentIndex
+from topicTerms import top_terms
+from inferencer import Inferencer
+from onlineVariationalBayes import OnlineVariationalBayes
+from instrumentation import NULL_PHASE
 reload(sys)
 sys.setdefaultencoding('utf-8')
 
@@ -17,9 +30,11 @@ class LDA(object):
     """
     The class: LDA, a topic model.
     """
-    def __init__(self):
+    def __init__(self,instrumentation=None):
         """
         Initializing an instance of LDA.
+        :param instrumentation: an instance of class: Instrumentation, which measures loading corpus, training and
+                                outputting. Default value is None, which means nothing is measured.
         """
         # corpus of a LDA model.
         self.corpus = Corpus()
@@ -29,8 +44,23 @@ class LDA(object):
         self.document_distribution_over_topic = None
         # gibbs sampler.
         self.gibbs_sampler = None
+        # parameter of LDA, which determines the distribution of documents over topics.
+        self.alpha = None
+        # parameter of LDA, which determines the distribution of topics over terms.
+        self.beta = None
+        # counter, [k][t] refers to the number of times that term t has been observed with topic k.
+        self.topic_term_count_matrix = None
+        # the most probable terms of every topic, tuple of distribution, number of terms, terms and probabilities.
+        self.top_terms_cache = None
+        # [k] refers the stability of topic k across chains, if the model is trained by several chains.
+        self.topic_stability = None
+        # the instrumentation of the phases of the model.
+        self.instrumentation = instrumentation
+        # the index of the distribution of documents over topics, which is built by build_index.
+        self.document_index = None
 
-    def load_directory_corpus(self,directory,key_word_list=None,no_key_word_list=None,sep=' '):
+    def load_directory_corpus(self,directory,key_word_list=None,no_key_word_list=None,sep=' ',workers=1,
+                              cache_directory=None):
         """
         The method to load corpus from directory, which contains the documents. And each document in the directory is an
         dependent file. Also, the document must has been tokenize and stop words were moved. And the character between
@@ -40,10 +70,16 @@ class LDA(object):
         :param key_word_list: the string the must appeared in the name of document. Default value is None.
         :param no_key_word_list: the string the must not appeared in the name of document. Default value is None.
         :param sep: the character between two words in document. Default value is blank space.
+        :param workers: number of processes that read and tokenize documents. Default value is 1.
+        :param cache_directory: the directory where the preprocessed corpus is cached. Default value is None, which
+                                means no cache.
         :return: nothing.
         """
-        self.corpus.load_directory_corpus(directory=directory, key_word_list=key_word_list,
-                                          no_key_word_list=no_key_word_list,sep=sep)
+        with self.measure('ingest') as record:
+            self.corpus.load_directory_corpus(directory=directory, key_word_list=key_word_list,
+                                              no_key_word_list=no_key_word_list,sep=sep,workers=workers,
+                                              cache_directory=cache_directory)
+            record['tokens'] = len(self.corpus.tokens)
 
     def load_file_corpus(self,corpus_file,sep=' '):
         """
@@ -55,28 +91,440 @@ class LDA(object):
         :param sep:the character between two words in document. Default value is blank space.
         :return:Nothing
         """
-        self.corpus.load_file_corpus(corpus_file=corpus_file,sep=sep)
+        with self.measure('ingest') as record:
+            self.corpus.load_file_corpus(corpus_file=corpus_file,sep=sep)
+            record['tokens'] = len(self.corpus.tokens)
 
-    def train_model(self,topic_number=10,iteration_number=1000,burn_in=500,update_cycle=100):
+    def prune_vocabulary(self,min_df=1,max_df=1.0,max_terms=None):
+        """
+        The method that removes rare and common terms from the loaded corpus, before training the model.
+        This method calls an function of corpus, see Corpus.prune_vocabulary.
+        :param min_df: terms that appear in less documents are removed, a number or a proportion of documents. Default
+                       value is 1.
+        :param max_df: terms that appear in more documents are removed, a number or a proportion of documents. Default
+                       value is 1.0.
+        :param max_terms: the maximal number of terms, the most frequent ones are kept. Default value is None.
+        :return: dict of removed_terms, removed_tokens, term_number, token_number and empty_documents.
+        """
+        with self.measure('ingest', tokens=len(self.corpus.tokens)):
+            return self.corpus.prune_vocabulary(min_df=min_df,max_df=max_df,max_terms=max_terms)
+
+    def measure(self,name,tokens=None):
+        """
+        The method that measures a phase by the instrumentation, see GibbsSampler.measure.
+        :param name: name of the phase.
+        :param tokens: number of words that the phase processes. Default value is None.
+        :return: the phase, whose record is a dict.
+        """
+        if self.instrumentation != None:
+            return self.instrumentation.phase(name, tokens=tokens)
+        else:
+            return NULL_PHASE
+
+    def train_model(self,topic_number=10,iteration_number=1000,burn_in=500,update_cycle=100,sampler='gibbs',
+                    workers=1,checkpoint_file=None,checkpoint_cycle=50,resume=False,engine='gibbs',batch_size=256,
+                    pass_number=1,corpus_file=None,sep=' ',monitor_cycle=None,tolerance=None,held_out_documents=None,
+                    callback=None,optimize_cycle=None,optimize_beta=False,chains=1):
         """
         The method that trains LDA model.
         :param topic_number: number of topics.
         :param iteration_number: number of iterations.
         :param burn_in: number of iterations that belong to the phrase of burn in.
         :param update_cycle: how often does we updates parameters of LDA after burn in.
+        :param sampler: 'gibbs' for the standard Gibbs sampler, whose cost per word grows with the number of topics, or
+                        'sparse' for the SparseLDA sampler, whose cost per word depends on the topics observed in the
+                        document and with the word. Default value is 'gibbs'.
+        :param workers: number of processes that sample the documents in parallel (approximate distributed LDA). Only
+                        the 'gibbs' sampler supports more than one process. Default value is 1.
+        :param checkpoint_file: the file where the state of sampler is saved every checkpoint_cycle iterations. Default
+                                value is None, which means no checkpoint.
+        :param checkpoint_cycle: how often does we save the state of sampler. Default value is 50.
+        :param resume: boolean value, whether to continue the training from checkpoint_file if it exists. Default value
+                       is False.
+        :param engine: 'gibbs' for Gibbs Sampling, which needs all documents in memory, or 'online' for online
+                       variational Bayes, which reads the documents in batches. The parameters of Gibbs Sampling above
+                       are not used by 'online', and the parameters below are only used by 'online'. Default value is
+                       'gibbs'.
+        :param batch_size: number of documents in a batch. Default value is 256.
+        :param pass_number: number of times that all documents are read. Default value is 1.
+        :param corpus_file: the file that contains all documents, one line per document, which is read in batches while
+                            training instead of loaded to the corpus. Default value is None, which means the documents
+                            of the corpus are trained.
+        :param sep: the character between two words in corpus_file and held_out_documents. Default value is blank
+                    space.
+        :param monitor_cycle: how often does Gibbs Sampling calculate the log likelihood and the perplexity of
+                              held_out_documents. Default value is None, which means never.
+        :param tolerance: Gibbs Sampling stops early when the relative improvement of the log likelihood is less than
+                          it. Default value is None, which means never.
+        :param held_out_documents: list of documents that are not trained, each of which is a string whose words are
+                                   separated by sep, or a list of words. Default value is None.
+        :param callback: a function that is called with the statistics of every iteration of Gibbs Sampling, see
+                         GibbsSampler.iterate_gibbs_sample. Default value is None.
+        :param optimize_cycle: how often does Gibbs Sampling learn an asymmetric alpha after burn in, starting from the
+                               symmetric one. Default value is None, which means alpha and beta are constant.
+        :param optimize_beta: boolean value, whether to learn beta, shared by all terms, with alpha. Default value is
+                              False.
+        :param chains: number of independent chains of Gibbs Sampling, which are run by workers processes, see
+                       train_chains. Default value is 1.
         :return: Nothing.
         """
+        if engine == 'online':
+            self.train_online(topic_number=topic_number,batch_size=batch_size,pass_number=pass_number,
+                              corpus_file=corpus_file,sep=sep)
+            return
+        elif engine != 'gibbs':
+            raise ValueError('unknown engine: ' + str(engine))
+        else:
+            pass
         alpha = [2.0] * topic_number
         beta = [0.1] * len(self.corpus.id_word)
+        if held_out_documents != None:
+            held_out_documents = self.known_word_ids(held_out_documents,sep=sep)
+        else:
+            pass
+        if chains > 1:
+            if checkpoint_file != None or callback != None:
+                raise ValueError('checkpoint_file and callback are not supported with chains: ' + str(chains))
+            else:
+                pass
+            self.train_chains(topic_number=topic_number,iteration_number=iteration_number,burn_in=burn_in,
+                              update_cycle=update_cycle,alpha=alpha,beta=beta,sampler=sampler,chains=chains,
+                              workers=workers,sample_arguments={'monitor_cycle': monitor_cycle,'tolerance': tolerance,
+                                                                'held_out_documents': held_out_documents,
+                                                                'optimize_cycle': optimize_cycle,
+                                                                'optimize_beta': optimize_beta})
+            return
+        else:
+            pass
+        self.topic_stability = None
         # Initializing the gibbs sampler.
-        self.gibbs_sampler = GibbsSampler(corpus=self.corpus,topic_number=topic_number,iteration_number=iteration_number,
-                                           burn_in=burn_in,update_cycle=update_cycle,alpha=alpha,beta=beta)
+        if sampler == 'gibbs' and workers > 1:
+            self.gibbs_sampler = ParallelGibbsSampler(corpus=self.corpus,topic_number=topic_number,
+                                                      iteration_number=iteration_number,burn_in=burn_in,
+                                                      update_cycle=update_cycle,alpha=alpha,beta=beta,workers=workers)
+        elif sampler == 'gibbs':
+            self.gibbs_sampler = GibbsSampler(corpus=self.corpus,topic_number=topic_number,
+                                              iteration_number=iteration_number,burn_in=burn_in,
+                                              update_cycle=update_cycle,alpha=alpha,beta=beta)
+        elif sampler == 'sparse' and workers == 1:
+            self.gibbs_sampler = SparseGibbsSampler(corpus=self.corpus,topic_number=topic_number,
+                                                    iteration_number=iteration_number,burn_in=burn_in,
+                                                    update_cycle=update_cycle,alpha=alpha,beta=beta)
+        else:
+            raise ValueError('unsupported sampler: ' + str(sampler) + ' with workers: ' + str(workers))
+        self.gibbs_sampler.instrumentation = self.instrumentation
         # Gibbs Sampling.
-        self.gibbs_sampler.gibbs_sample()
+        self.gibbs_sampler.gibbs_sample(checkpoint_file=checkpoint_file,checkpoint_cycle=checkpoint_cycle,resume=resume,
+                                        monitor_cycle=monitor_cycle,tolerance=tolerance,
+                                        held_out_documents=held_out_documents,callback=callback,
+                                        optimize_cycle=optimize_cycle,optimize_beta=optimize_beta)
         # Get the distribution of topics over terms.
         self.topic_distribution_over_term = self.gibbs_sampler.get_topic_distribution_over_term()
         # Get the distribution of documents over topics.
         self.document_distribution_over_topic = self.gibbs_sampler.get_document_distribution_over_topic()
+        self.document_index = None
+        self.alpha = self.gibbs_sampler.alpha
+        self.beta = self.gibbs_sampler.beta
+        self.topic_term_count_matrix = self.gibbs_sampler.topic_term_count_matrix
+
+    def train_chains(self,topic_number,iteration_number,burn_in,update_cycle,alpha,beta,sampler='gibbs',chains=4,
+                     workers=1,sample_arguments=None):
+        """
+        The method that trains LDA model by several independent chains of Gibbs Sampling in parallel processes, whose
+        topics are matched and averaged. The stability of every topic across chains is saved in topic_stability. It is
+        called by the method: train_model.
+        :param topic_number: number of topics.
+        :param iteration_number: number of iterations of every chain.
+        :param burn_in: number of iterations that belong to the phrase of burn in.
+        :param update_cycle: how often does we updates parameters of LDA after burn in.
+        :param alpha: the initial alpha.
+        :param beta: the initial beta.
+        :param sampler: 'gibbs' or 'sparse', the sampler of every chain.
+        :param chains: number of chains.
+        :param workers: number of processes. 1 means as many as the chains, but not more than the processors.
+        :param sample_arguments: dict of parameters of gibbs_sample of every chain.
+        :return: Nothing.
+        """
+        multiple_chains = MultipleChains(corpus=self.corpus,topic_number=topic_number,iteration_number=iteration_number,
+                                         burn_in=burn_in,update_cycle=update_cycle,alpha=alpha,beta=beta,chains=chains,
+                                         workers=workers if workers > 1 else None,sampler=sampler,
+                                         sample_arguments=sample_arguments)
+        multiple_chains.sample()
+        self.gibbs_sampler = None
+        self.topic_distribution_over_term = multiple_chains.get_topic_distribution_over_term()
+        self.document_distribution_over_topic = multiple_chains.get_document_distribution_over_topic()
+        self.document_index = None
+        self.topic_stability = multiple_chains.get_topic_stability()
+        self.alpha = multiple_chains.alpha
+        self.beta = multiple_chains.beta
+        self.topic_term_count_matrix = None
+
+    def sweep(self,topic_numbers,seeds=None,iteration_number=1000,burn_in=500,update_cycle=100,sampler='gibbs',
+              held_out_documents=None,held_out_fraction=0.1,sep=' ',workers=None,memory_limit=None,coherence_terms=10,
+              rank_by='perplexity'):
+        """
+        The method that trains LDA models with every number of topics and every seed on the loaded corpus, in parallel
+        processes that share it, and ranks them by held out perplexity or topic coherence, see ModelSelection. The
+        model itself is not changed, so the best number of topics can be trained by train_model afterwards.
+        :param topic_numbers: list of number of topics.
+        :param seeds: list of seed of random number generator. Default value is None, which means one random seed.
+        :param iteration_number: number of iterations of every configuration.
+        :param burn_in: number of iterations that belong to the phrase of burn in.
+        :param update_cycle: how often does we updates parameters of LDA after burn in.
+        :param sampler: 'gibbs' or 'sparse', the sampler of every configuration. Default value is 'gibbs'.
+        :param held_out_documents: list of documents whose perplexity is calculated, each of which is a string whose
+                                   words are separated by sep, or a list of words. Default value is None, which means
+                                   held_out_fraction of the documents of the corpus are held out from training.
+        :param held_out_fraction: the proportion of documents of the corpus that are held out, when held_out_documents
+                                  is None. Default value is 0.1.
+        :param sep: the character between two words in held_out_documents. Default value is blank space.
+        :param workers: number of processes. Default value is None, which means the number of processors.
+        :param memory_limit: the memory in megabytes of the configurations trained at the same time. Default value is
+                             None, which means no limit.
+        :param coherence_terms: number of terms of a topic whose coherence is calculated. Default value is 10.
+        :param rank_by: 'perplexity' or 'coherence'. Default value is 'perplexity'.
+        :return: list of dicts of topic_number, seed, perplexity, coherence, log_likelihood, seconds,
+                 estimated_memory_mb and rank, ordered from the best.
+        """
+        if held_out_documents != None:
+            corpus = self.corpus
+            held_out_documents = self.known_word_ids(held_out_documents,sep=sep)
+        elif held_out_fraction > 0:
+            random_state = np.random.RandomState(random.randint(0, 2 ** 31 - 1))
+            order = random_state.permutation(len(self.corpus.documents))
+            held_out_number = int(round(len(order) * held_out_fraction))
+            corpus = self.corpus.select_documents(np.sort(order[held_out_number:]))
+            held_out_documents = [self.corpus.documents[m].tolist() for m in np.sort(order[:held_out_number]).tolist()]
+        else:
+            corpus = self.corpus
+        model_selection = ModelSelection(corpus=corpus,topic_numbers=topic_numbers,seeds=seeds,
+                                         iteration_number=iteration_number,burn_in=burn_in,update_cycle=update_cycle,
+                                         sampler=sampler,held_out_documents=held_out_documents,workers=workers,
+                                         memory_limit=memory_limit,coherence_terms=coherence_terms,rank_by=rank_by)
+        return model_selection.select()
+
+    def train_online(self,topic_number=10,batch_size=256,pass_number=1,corpus_file=None,sep=' '):
+        """
+        The method that trains LDA model by online variational Bayes. It is called by the method: train_model.
+        :param topic_number: number of topics.
+        :param batch_size: number of documents in a batch.
+        :param pass_number: number of times that all documents are read.
+        :param corpus_file: the file that contains all documents, one line per document, which is read in batches.
+                            None means the documents of the corpus are trained.
+        :param sep: the character between two words in corpus_file.
+        :return: Nothing.
+        """
+        variational_bayes = OnlineVariationalBayes(corpus=self.corpus,topic_number=topic_number,beta=0.1,
+                                                   batch_size=batch_size,pass_number=pass_number,
+                                                   corpus_file=corpus_file,sep=sep)
+        variational_bayes.train()
+        if corpus_file != None:
+            # the documents of the file are named by their line numbers, as load_file_corpus does.
+            self.corpus.documents_name_dict = range(0, variational_bayes.document_number, 1)
+        else:
+            pass
+        self.gibbs_sampler = None
+        self.topic_stability = None
+        self.topic_distribution_over_term = variational_bayes.get_topic_distribution_over_term()
+        self.document_distribution_over_topic = variational_bayes.get_document_distribution_over_topic()
+        self.document_index = None
+        self.alpha = variational_bayes.alpha
+        self.beta = np.array([variational_bayes.beta] * len(self.corpus.word_id))
+        self.topic_term_count_matrix = None
+
+    def save(self,path):
+        """
+        The method that saves the trained model to a directory, which can be loaded by the method: load. The arrays are
+        saved in numpy .npy format, the distributions as float32, and the vocabulary and the names of documents as text
+        with one item per line.
+        :param path: the directory where the model is saved.
+        :return: Nothing.
+        """
+        parameters = {'topic_number': len(self.alpha), 'term_number': len(self.beta),
+                      'document_number': len(self.document_distribution_over_topic)}
+        contents = [('alpha.npy', np.asarray(self.alpha, dtype=np.float64)),
+                    ('beta.npy', np.asarray(self.beta, dtype=np.float64)),
+                    ('topic_distribution_over_term.npy',
+                     np.asarray(self.topic_distribution_over_term, dtype=np.float32)),
+                    ('document_distribution_over_topic.npy',
+                     np.asarray(self.document_distribution_over_topic, dtype=np.float32)),
+                    ('vocabulary.txt', '\n'.join(self.corpus.vocabulary())),
+                    ('documents.txt', '\n'.join([str(name) for name in self.corpus.documents_name_dict])),
+                    ('parameters.json', json.dumps(parameters))]
+        if self.topic_term_count_matrix is not None:
+            # the counters are only available when the model is trained by Gibbs Sampling.
+            contents.append(('topic_term_count_matrix.npy', np.asarray(self.topic_term_count_matrix, dtype=np.int32)))
+        else:
+            pass
+        write_files(directory=path, contents=contents)
+
+    @staticmethod
+    def load(path):
+        """
+        The method that loads a model saved by the method: save. The arrays are memory-mapped read-only, so they are
+        read from disk when they are used and their pages are shared by all processes that load the same model.
+        :param path: the directory where the model is saved.
+        :return: an instance of LDA, which can output and infer, but has no documents.
+        """
+        lda = LDA()
+        file = open(os.path.join(path, 'parameters.json'), 'rb')
+        parameters = json.loads(file.read())
+        file.close()
+        lda.alpha = np.load(os.path.join(path, 'alpha.npy'))
+        lda.beta = np.load(os.path.join(path, 'beta.npy'))
+        lda.topic_distribution_over_term = np.load(os.path.join(path, 'topic_distribution_over_term.npy'),
+                                                   mmap_mode='r')
+        lda.document_distribution_over_topic = np.load(os.path.join(path, 'document_distribution_over_topic.npy'),
+                                                       mmap_mode='r')
+        if os.path.exists(os.path.join(path, 'topic_term_count_matrix.npy')):
+            lda.topic_term_count_matrix = np.load(os.path.join(path, 'topic_term_count_matrix.npy'), mmap_mode='r')
+        else:
+            pass
+        file = open(os.path.join(path, 'vocabulary.txt'), 'rb')
+        words = file.read().split('\n')
+        file.close()
+        lda.corpus.set_vocabulary(words[0:parameters['term_number']])
+        file = open(os.path.join(path, 'documents.txt'), 'rb')
+        lda.corpus.documents_name_dict = file.read().split('\n')[0:parameters['document_number']]
+        file.close()
+        return lda
+
+    def infer(self,documents,iterations=50,burn_in=None,sep=' '):
+        """
+        The method that infers the distribution of new documents over topics against the trained model, without
+        changing the model. Words that are not in the vocabulary of the corpus are ignored.
+        :param documents: list of documents, each of which is a string whose words are separated by sep, or a list of
+                          words.
+        :param iterations: number of iterations of Gibbs Sampling. Default value is 50.
+        :param burn_in: number of "burn in" iterations, after which the distribution is averaged over iterations.
+                        Default value is None, which means half of iterations.
+        :param sep: the character between two words in document. Default value is blank space.
+        :return: an numpy array, [m][k] refers the probability that assigning topic k to document m.
+        """
+        inferencer = Inferencer(topic_distribution_over_term=self.topic_distribution_over_term,
+                                alpha=self.alpha)
+        return inferencer.infer(documents=self.known_word_ids(documents,sep=sep),iteration_number=iterations,
+                                burn_in=burn_in)
+
+    def known_word_ids(self,documents,sep=' '):
+        """
+        The method that translates the words of documents to their ids, and ignores the words that are not in the
+        vocabulary of the corpus.
+        :param documents: list of documents, each of which is a string whose words are separated by sep, or a list of
+                          words.
+        :param sep: the character between two words in document. Default value is blank space.
+        :return: list of documents, each of which is a list of id of words.
+        """
+        word_id = self.corpus.word_id
+        id_documents = []
+        for document in documents:
+            if isinstance(document, basestring):
+                document = document.replace('\n', sep).split(sep)
+            else:
+                pass
+            id_documents.append([word_id[word] for word in document if word in word_id])
+        return id_documents
+
+    def update(self,new_documents,iterations=50,burn_in=None,sep=' ',document_names=None):
+        """
+        The method that adds new documents to the corpus and updates the trained model incrementally, without training
+        it again. The words of the new documents are assigned random topics and sampled for some iterations together
+        with the same number of old documents, in turn, so that the cost depends on the size of the new documents
+        rather than the corpus. New words are added to the vocabulary. It needs the model trained by Gibbs Sampling.
+        :param new_documents: list of documents, each of which is a string whose words are separated by sep, or a list
+                              of words.
+        :param iterations: number of iterations of Gibbs Sampling. Default value is 50.
+        :param burn_in: number of "burn in" iterations, after which the distributions are averaged over iterations.
+                        Default value is None, which means half of iterations.
+        :param sep: the character between two words in document. Default value is blank space.
+        :param document_names: list of names of the new documents. Default value is None, which means the numbers that
+                               follow the documents of the corpus.
+        :return: list of id of the new documents.
+        """
+        if self.gibbs_sampler == None:
+            raise ValueError('update needs a model trained by Gibbs Sampling in this process')
+        else:
+            pass
+        if document_names == None:
+            first_document = len(self.corpus.documents_name_dict)
+            document_names = range(first_document, first_document + len(new_documents), 1)
+        else:
+            pass
+        for document, document_name in zip(new_documents, document_names):
+            if isinstance(document, basestring):
+                document = document.replace('\n', sep).split(sep)
+            else:
+                pass
+            self.corpus.add_document(self.corpus.words_to_ids(document), document_name)
+        document_list = self.gibbs_sampler.add_documents(corpus=self.corpus)
+        self.gibbs_sampler.sample_new_documents(document_list=document_list,iteration_number=iterations,
+                                                burn_in=burn_in)
+        self.topic_distribution_over_term = self.gibbs_sampler.get_topic_distribution_over_term()
+        self.document_distribution_over_topic = self.gibbs_sampler.get_document_distribution_over_topic()
+        self.document_index = None
+        self.alpha = self.gibbs_sampler.alpha
+        self.beta = self.gibbs_sampler.beta
+        self.topic_term_count_matrix = self.gibbs_sampler.topic_term_count_matrix
+        return document_list
+
+    def build_index(self,metric='hellinger',cluster_number=None,probe_number=8):
+        """
+        The method that builds the index of the trained distribution of documents over topics, which answers the queries
+        of similar_documents. It is dropped when the model is trained or updated, and similar_documents builds it again
+        with the default parameters if it is not built again.
+        :param metric: 'hellinger', 'cosine' or 'js', see DocumentIndex. Default value is 'hellinger'.
+        :param cluster_number: number of clusters of the approximate mode, for example the square root of the number of
+                               documents. Default value is None, which means the queries are exact.
+        :param probe_number: number of clusters scanned by a query in the approximate mode. Default value is 8.
+        :return: the instance of class: DocumentIndex.
+        """
+        self.document_index = DocumentIndex(document_distribution_over_topic=self.document_distribution_over_topic,
+                                            document_names=self.corpus.documents_name_dict,metric=metric,
+                                            cluster_number=cluster_number,probe_number=probe_number)
+        return self.document_index
+
+    def similar_documents(self,documents=None,distributions=None,k=10):
+        """
+        The method that finds the documents whose distributions over topics are the most similar to some documents of
+        the corpus, or to some distributions, by the index that is built by build_index, or with the default
+        parameters if it has not been built.
+        :param documents: list of documents of the corpus, each of which is its name or its id. Default value is None.
+        :param distributions: an Q * K array of distributions over topics, for example the result of infer. It is used
+                              when documents is None.
+        :param k: number of similar documents of each query. Default value is 10.
+        :return: list of the results of every query, each of which is a list of tuples of name of document and its
+                 distance, ordered from the most similar.
+        """
+        if self.document_index == None:
+            self.build_index()
+        else:
+            pass
+        if documents != None:
+            ids, distances = self.document_index.query_documents(documents,k=k)
+        else:
+            ids, distances = self.document_index.query(distributions,k=k)
+        names = self.corpus.documents_name_dict
+        results = []
+        for row, distance_row in zip(ids.tolist(), distances.tolist()):
+            results.append([(names[m], distance) for m, distance in zip(row, distance_row) if m >= 0])
+        return results
+
+    def get_top_terms(self,term_number=10):
+        """
+        The method that gets the most probable terms of every topic, ordered by probability and then by id of term as
+        a full sort would, see topicTerms.top_terms. The result is cached until the distribution changes.
+        :param term_number: number of terms of each topic.
+        :return: tuple of two K * term_number numpy arrays, the ids of terms and their probabilities.
+        """
+        if self.top_terms_cache != None and self.top_terms_cache[0] is self.topic_distribution_over_term and \
+                self.top_terms_cache[1] == term_number:
+            return self.top_terms_cache[2], self.top_terms_cache[3]
+        else:
+            pass
+        term_number = min(term_number, np.shape(self.topic_distribution_over_term)[1])
+        terms, probabilities = top_terms(self.topic_distribution_over_term, term_number)
+        self.top_terms_cache = (self.topic_distribution_over_term, term_number, terms, probabilities)
+        return terms, probabilities
 
     def output_topic(self, term_number=10,save_topic=False,save_file_name='topic_distribution_over_terms.txt'):
         """
@@ -86,71 +534,86 @@ class LDA(object):
         :param save_file_name: the name of file that contains the distribution if save_topic is True.
         :return: Nothing.
         """
-        # Printing the distribution.
-        for topic in range(0, len(self.topic_distribution_over_term), 1):
-            probability_list = self.topic_distribution_over_term[topic]
-            term_prob_dict = {}
-            for index in range(0,self.gibbs_sampler.term_number,1):
-                term_prob_dict[index] = probability_list[index]
-            probability_list = sorted(term_prob_dict.iteritems(), key=lambda d:d[1], reverse = True)[0:term_number]
-            print '\n' + '#' * 50
-            print 'topic:', topic
-            for term,probability in probability_list:
-                print self.corpus.id_to_word(term),':', probability
-        # Saving the distribution to an file.
-        if save_topic==True:
-            path = os.getcwd().replace('\\','/').split('/LDA/')[0] + '/LDA/result/'
-            file = open(path + save_file_name,'wb')
-            for topic in range(0, len(self.topic_distribution_over_term), 1):
-                probability_list = self.topic_distribution_over_term[topic]
-                term_prob_dict = {}
-                for index in range(0, self.gibbs_sampler.term_number, 1):
-                    term_prob_dict[index] = probability_list[index]
-                probability_list = sorted(term_prob_dict.iteritems(), key=lambda d: d[1], reverse=True)[0:term_number]
-                file.write('#' * 50 + '\n')
-                file.write('topic:'+ str(topic) + '\n')
-                for term, probability in probability_list:
-                    file.write(self.corpus.id_to_word(term) + ':' + str(probability) + '\n')
-            file.close()
-        else:
-            pass
+        with self.measure('output'):
+            terms, probabilities = self.get_top_terms(term_number=term_number)
+            terms = terms.tolist()
+            probabilities = probabilities.tolist()
+            # Printing the distribution.
+            for topic in range(0, len(terms), 1):
+                print '\n' + '#' * 50
+                print 'topic:', topic
+                for term,probability in zip(terms[topic], probabilities[topic]):
+                    print self.corpus.id_to_word(term),':', probability
+            # Saving the distribution to an file.
+            if save_topic==True:
+                path = os.getcwd().replace('\\','/').split('/LDA/')[0] + '/LDA/result/'
+                lines = []
+                for topic in range(0, len(terms), 1):
+                    lines.append('#' * 50 + '\n' + 'topic:' + str(topic) + '\n')
+                    lines.extend([self.corpus.id_to_word(term) + ':' + str(probability) + '\n'
+                                  for term, probability in zip(terms[topic], probabilities[topic])])
+                file = open(path + save_file_name,'wb')
+                file.write(''.join(lines))
+                file.close()
+            else:
+                pass
 
     def ouput_document(self,document_number=None,save_document=False,
-                       save_file_name='document_distribution_over_topics.csv'):
+                       save_file_name='document_distribution_over_topics.csv',chunk_size=10000):
         """
         The method that prints or saves the distribution of documents over topics.
         :param document_number: number of documents that needed to be printed or saved. Default value is None.
         :param save_document: boolean value, whether to save the distribution to an file.
         :param save_file_name: the name of file that contains the distribution if save_document is True.
+        :param chunk_size: number of documents that are formatted at once when saving. Default value is 10000.
         :return: Nothing.
         """
-        # get the number of documents that needed to be printed or saved when the default value of document_number is
-        # None.
-        if document_number == None:
-            document_number = len(self.corpus.documents)
-        else:
-            pass
-        # Printing the distribution.
-        for document in range(0, self.gibbs_sampler.document_number, 1)[0:document_number]:
-            print '\n' + '#' * 50
-            print 'document:',self.corpus.documents_name_dict[document]
-            print self.document_distribution_over_topic[document]
-        # Saving the distribution to an file.
-        if save_document==True:
-            path = os.getcwd().replace('\\','/').split('/LDA/')[0] + '/LDA/result/'
-            file = open(path + save_file_name,'wb')
-            writer = csv.writer(file)
-            head = ['document']
-            for topic in range(0,self.gibbs_sampler.topic_number,1):
-                head.append('topic_' + str(topic))
-            writer.writerow(head)
-            for document in range(0, self.gibbs_sampler.document_number, 1):
-                row = [self.corpus.documents_name_dict[document]]
-                row = row +  self.document_distribution_over_topic[document]
-                writer.writerow(row)
-            file.close()
+        with self.measure('output'):
+            # get the number of documents that needed to be printed or saved when the default value of document_number
+            # is None.
+            if document_number == None:
+                document_number = len(self.document_distribution_over_topic)
+            else:
+                pass
+            # Printing the distribution.
+            for document in range(0, len(self.document_distribution_over_topic), 1)[0:document_number]:
+                print '\n' + '#' * 50
+                print 'document:',self.corpus.documents_name_dict[document]
+                print self.document_distribution_over_topic[document].tolist()
+            # Saving the distribution to an file.
+            if save_document==True:
+                path = os.getcwd().replace('\\','/').split('/LDA/')[0] + '/LDA/result/'
+                file = open(path + save_file_name,'wb')
+                writer = csv.writer(file)
+                head = ['document']
+                for topic in range(0,len(self.alpha),1):
+                    head.append('topic_' + str(topic))
+                writer.writerow(head)
+                # the rows of a chunk are formatted by one string formatting, in the same format as csv.writer.
+                row_format = '%s' + ',%r' * len(self.alpha) + '\r\n'
+                for start in range(0, len(self.document_distribution_over_topic), chunk_size):
+                    block = self.document_distribution_over_topic[start:start + chunk_size]
+                    cells = np.empty((len(block), len(self.alpha) + 1), dtype=object)
+                    names = self.corpus.documents_name_dict[start:start + len(block)]
+                    cells[:, 0] = [self.csv_field(name) for name in names]
+                    cells[:, 1:] = block.tolist()
+                    file.write((row_format * len(block)) % tuple(cells.ravel().tolist()))
+                file.close()
+            else:
+                pass
+
+    @staticmethod
+    def csv_field(value):
+        """
+        The method that formats a value as a field of csv file, quoted as csv.writer does by default.
+        :param value: the value.
+        :return: the field, a string.
+        """
+        field = str(value)
+        if ',' in field or '"' in field or '\r' in field or '\n' in field:
+            return '"' + field.replace('"', '""') + '"'
         else:
-            pass
+            return field
 
 if __name__ == '__main__':
     print os.getcwd().replace('\\','/').replace('source','result/')
\ No newline at end of file
@@ -0,0 +1,284 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the class: ModelSelection for LDA model, which trains models with different numbers of topics and
+seeds in parallel processes and ranks them by held out perplexity and topic coherence.
+"""
+import sys
+import time
+import random
+import multiprocessing
+import numpy as np
+from corpus import Corpus
+from gibbsSampler import GibbsSampler
+from sparseGibbsSampler import SparseGibbsSampler
+from parallelGibbsSampler import shared_array, fork_pool
+from topicTerms import top_terms
+from instrumentation import get_logger
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+logger = get_logger('modelSelection')
+
+# the instance whose configurations are trained by the processes of the pool, which is set in every process by
+# set_selection. The processes are forked, so they share its corpus, whose words are in shared memory and only read.
+selection_in_process = None
+
+
+def set_selection(selection):
+    """
+    The function that is called in every process of the pool when it starts, to set the instance of the process.
+    :param selection: an instance of class: ModelSelection.
+    :return: Nothing.
+    """
+    global selection_in_process
+    selection_in_process = selection
+
+
+def train_configuration(arguments):
+    """
+    The function that is run by the processes of the pool to train one configuration.
+    :param arguments: tuple of number of topics and seed of random number generator.
+    :return: dict of the scores of the configuration, see ModelSelection.train_configuration.
+    """
+    topic_number, seed = arguments
+    return selection_in_process.train_configuration(topic_number=topic_number, seed=seed)
+
+
+def topic_coherence(corpus, top_terms, block_size=4096):
+    """
+    The function that calculates the UMass coherence of topics from the co-occurrence of their terms in the documents of
+    a corpus,
+        sum_{i > j} log((D(t_i, t_j) + 1) / D(t_j))
+    where t_1, t_2, ... are the most probable terms of a topic in order, D(t) is the number of documents that contain t,
+    and D(t_i, t_j) the number of documents that contain both. The documents are counted in blocks, so the memory does
+    not grow with the number of documents.
+    :param corpus: an instance of class: Corpus.
+    :param top_terms: an K * N array, [k] refers the ids of the most probable terms of topic k, ordered from the most
+                      probable.
+    :param block_size: number of documents counted at once. Default value is 4096.
+    :return: an numpy array, [k] refers the coherence of topic k, which is at most 0, the larger the more coherent.
+    """
+    top_terms = np.asarray(top_terms, dtype=np.int64)
+    topic_number, term_number = top_terms.shape
+    terms = np.unique(top_terms)
+    # [t] refers the column of term t, or -1 if it is not a top term.
+    column = np.full(len(corpus.word_id), -1, dtype=np.int64)
+    column[terms] = np.arange(0, len(terms), 1)
+    topic_columns = column[top_terms]
+    tokens = corpus.token_array()
+    offsets = corpus.offset_array()
+    document_number = len(offsets) - 1
+    # [k][i][j] refers the number of documents that contain both term i and term j of topic k.
+    co_occurrence = np.zeros((topic_number, term_number, term_number), dtype=np.float64)
+    for start in range(0, document_number, block_size):
+        end = min(start + block_size, document_number)
+        words = np.asarray(tokens[offsets[start]:offsets[end]], dtype=np.int64)
+        documents = np.repeat(np.arange(0, end - start, 1), np.diff(offsets[start:end + 1]))
+        columns = column[words]
+        known = columns >= 0
+        incidence = np.zeros((end - start, len(terms)), dtype=np.float32)
+        incidence[documents[known], columns[known]] = 1
+        for k in range(0, topic_number, 1):
+            block = incidence[:, topic_columns[k]]
+            co_occurrence[k] += block.T.dot(block)
+    coherence = np.zeros(topic_number, dtype=np.float64)
+    for k in range(0, topic_number, 1):
+        document_frequency = np.maximum(np.diag(co_occurrence[k]), 1)
+        for i in range(1, term_number, 1):
+            coherence[k] += np.log((co_occurrence[k][i, :i] + 1) / document_frequency[:i]).sum()
+    return coherence
+
+
+def estimate_memory(corpus, topic_number, list_kernel_topics=0):
+    """
+    The function that estimates the memory of training one configuration by GibbsSampler in bytes: the topics assigned
+    to words, the counters, the accumulators and the distributions, and the copy of the counts of all terms in Python
+    lists that a sweep makes when there are less topics than list_kernel_topics (see
+    GibbsSampler.sample_documents_by_lists). The corpus is shared, so it is not included.
+    :param corpus: an instance of class: Corpus.
+    :param topic_number: number of topics.
+    :param list_kernel_topics: the list_kernel_topics of the sampler. Default value is 0, which means no copy.
+    :return: the number of bytes.
+    """
+    document_number = len(corpus.offset_array()) - 1
+    term_number = len(corpus.word_id)
+    # int32 counters, float64 accumulators and float32 distributions.
+    memory = 4 * len(corpus.tokens) + 16 * topic_number * (document_number + term_number)
+    if topic_number < list_kernel_topics:
+        # a pointer per count and a list per term.
+        memory += (8 * topic_number + 72) * term_number
+    else:
+        pass
+    return memory
+
+
+class ModelSelection(object):
+    """
+    The class, which trains LDA models with every number of topics and every seed, in a pool of processes that share
+    one corpus, and scores every configuration by:
+        perplexity:  the perplexity of the held out documents, by document completion (see GibbsSampler.perplexity),
+                     the smaller the better.
+        coherence:   the mean UMass coherence of the topics in the training documents (see topic_coherence), the larger
+                     the better.
+    The words of the corpus are copied to shared memory once, before the processes are forked. The configurations run
+    at the same time are limited by the number of processes and by the estimated memory of their samplers.
+    """
+    def __init__(self,corpus,topic_numbers,seeds=None,iteration_number=1000,burn_in=500,update_cycle=100,
+                 sampler='gibbs',held_out_documents=None,workers=None,memory_limit=None,coherence_terms=10,
+                 rank_by='perplexity',sample_arguments=None):
+        """
+        The method that initializes an instance of the class. The parameters iteration_number, burn_in and update_cycle
+        are the same as GibbsSampler, and alpha and beta are the same as LDA.train_model.
+        :param corpus: an instance of class: Corpus, the training documents.
+        :param topic_numbers: list of number of topics.
+        :param seeds: list of seed of random number generator, each of which is trained with every number of topics.
+                      Default value is None, which means one seed drawn from the random number generator.
+        :param sampler: 'gibbs' for GibbsSampler or 'sparse' for SparseGibbsSampler. Default value is 'gibbs'.
+        :param held_out_documents: list of documents, each of which is a list of id of words, whose perplexity is
+                                   calculated. Default value is None, which means no perplexity.
+        :param workers: number of processes. Default value is None, which means the number of processors.
+        :param memory_limit: the memory in megabytes that the configurations trained at the same time may use, see
+                             estimate_memory. A configuration that needs more is trained alone. Default value is None,
+                             which means no limit.
+        :param coherence_terms: number of the most probable terms of a topic whose coherence is calculated. Default
+                                value is 10.
+        :param rank_by: 'perplexity' or 'coherence'. Default value is 'perplexity'.
+        :param sample_arguments: dict of parameters of gibbs_sample of every configuration. Default value is None.
+        """
+        if sampler == 'gibbs':
+            self.sampler_class = GibbsSampler
+        elif sampler == 'sparse':
+            self.sampler_class = SparseGibbsSampler
+        else:
+            raise ValueError('unsupported sampler: ' + str(sampler))
+        if rank_by not in ('perplexity', 'coherence'):
+            raise ValueError('unknown score: ' + str(rank_by))
+        else:
+            pass
+        self.corpus = corpus
+        self.topic_numbers = list(topic_numbers)
+        if seeds == None:
+            seeds = [random.randint(0, 2 ** 31 - 1)]
+        else:
+            pass
+        self.seeds = list(seeds)
+        self.iteration_number = iteration_number
+        self.burn_in = burn_in
+        self.update_cycle = update_cycle
+        self.held_out_documents = held_out_documents
+        if workers == None:
+            workers = multiprocessing.cpu_count()
+        else:
+            pass
+        self.workers = workers
+        self.memory_limit = memory_limit
+        self.coherence_terms = coherence_terms
+        self.rank_by = rank_by
+        self.sample_arguments = sample_arguments if sample_arguments != None else {}
+        # the corpus whose words are in shared memory, which is read by the processes of the pool.
+        self.shared_corpus = None
+        # list of the scores of all configurations, ordered from the best, see train_configuration.
+        self.summary = None
+
+    def select(self):
+        """
+        The method that trains all configurations and ranks them.
+        :return: list of dicts of the scores of the configurations, ordered from the best, each of which also has its
+                 rank, from 1.
+        """
+        # the words are copied to shared memory, so that the processes read them without copying pages. The corpus is
+        # not changed.
+        corpus = Corpus()
+        corpus.tokens = shared_array(len(self.corpus.tokens), dtype=np.int32)
+        corpus.tokens[:] = self.corpus.token_array()
+        corpus.document_offsets = shared_array(len(self.corpus.document_offsets), dtype=np.int_)
+        corpus.document_offsets[:] = self.corpus.offset_array()
+        corpus.documents_name_dict = self.corpus.documents_name_dict
+        corpus.word_id = self.corpus.word_id
+        corpus.id_word = self.corpus.id_word
+        self.shared_corpus = corpus
+        # the largest configurations are started first, so that the small ones fill the remaining memory.
+        configurations = [(topic_number, seed) for topic_number in self.topic_numbers for seed in self.seeds]
+        configurations.sort(key=lambda configuration: -configuration[0])
+        memory = dict((topic_number, estimate_memory(corpus, topic_number, self.sampler_class.list_kernel_topics) /
+                       1024.0 / 1024.0) for topic_number in self.topic_numbers)
+        pool = fork_pool(processes=max(min(self.workers, len(configurations)), 1), initializer=set_selection,
+                         initargs=(self,))
+        results = []
+        try:
+            # the configurations that are running, list of tuples of number of topics and result.
+            running = []
+            while len(configurations) > 0 or len(running) > 0:
+                used_memory = sum([memory[topic_number] for topic_number, result in running])
+                # the configurations that fit in the remaining memory, or any one if nothing is running.
+                fitting = [configuration for configuration in configurations
+                           if len(running) == 0 or self.memory_limit == None or
+                           used_memory + memory[configuration[0]] <= self.memory_limit]
+                if len(running) < self.workers and len(fitting) > 0:
+                    configurations.remove(fitting[0])
+                    running.append((fitting[0][0], pool.apply_async(train_configuration, (fitting[0],))))
+                    continue
+                else:
+                    pass
+                finished = [item for item in running if item[1].ready()]
+                for item in finished:
+                    results.append(item[1].get())
+                    running.remove(item)
+                if len(finished) == 0:
+                    time.sleep(0.05)
+                else:
+                    pass
+        finally:
+            pool.terminate()
+            pool.join()
+            self.shared_corpus = None
+        if self.rank_by == 'perplexity':
+            # nan, which means no held out document, is ranked last.
+            results.sort(key=lambda result: (np.isnan(result['perplexity']), result['perplexity']))
+        else:
+            results.sort(key=lambda result: -result['coherence'])
+        for rank in range(0, len(results), 1):
+            results[rank]['rank'] = rank + 1
+            logger.info('rank: %d topics: %d seed: %d perplexity: %.3f coherence: %.3f seconds: %.1f', rank + 1,
+                        results[rank]['topic_number'], results[rank]['seed'], results[rank]['perplexity'],
+                        results[rank]['coherence'], results[rank]['seconds'])
+        self.summary = results
+        return results
+
+    def train_configuration(self, topic_number, seed):
+        """
+        The method that trains one configuration and scores it. It is run in a process of the pool.
+        :param topic_number: number of topics.
+        :param seed: seed of random number generator.
+        :return: dict of topic_number, seed, perplexity, coherence, log_likelihood, seconds and estimated_memory_mb.
+        """
+        start_time = time.time()
+        random.seed(seed)
+        sampler = self.sampler_class(corpus=self.shared_corpus,topic_number=topic_number,
+                                     iteration_number=self.iteration_number,burn_in=self.burn_in,
+                                     update_cycle=self.update_cycle,alpha=[2.0] * topic_number,
+                                     beta=[0.1] * len(self.shared_corpus.word_id))
+        sampler.gibbs_sample(**self.sample_arguments)
+        if self.held_out_documents != None and len(self.held_out_documents) > 0:
+            perplexity = sampler.perplexity(self.held_out_documents)
+        else:
+            perplexity = float('nan')
+        distribution = sampler.get_topic_distribution_over_term()
+        terms, probabilities = top_terms(distribution, self.coherence_terms)
+        coherence = topic_coherence(self.shared_corpus, terms)
+        result = {'topic_number': topic_number, 'seed': seed, 'perplexity': perplexity,
+                  'coherence': float(coherence.mean()), 'log_likelihood': sampler.log_likelihood(),
+                  'seconds': time.time() - start_time,
+                  'estimated_memory_mb': estimate_memory(self.shared_corpus, topic_number,
+                                                         self.sampler_class.list_kernel_topics) / 1024.0 / 1024.0}
+        logger.info('topics: %d seed: %d perplexity: %.3f coherence: %.3f seconds: %.1f', topic_number, seed,
+                    perplexity, result['coherence'], result['seconds'])
+        return result
+
+    def get_summary(self):
+        """
+        The method that gets the scores of all configurations, ordered from the best.
+        :return: list of dicts, see select.
+        """
+        return self.summary
@@ -0,0 +1,236 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the class: MultipleChains for LDA model, which runs several independent Markov chains of Gibbs
+Sampling in parallel processes and combines their estimates.
+"""
+import sys
+import random
+import multiprocessing
+import numpy as np
+from gibbsSampler import GibbsSampler
+from sparseGibbsSampler import SparseGibbsSampler
+from parallelGibbsSampler import shared_array, fork_pool
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+# the instance whose chains are run by the processes of the pool, which is set in every process by set_chains. The
+# processes are forked, so they share its corpus, which is only read, and its arrays of results, which are allocated in
+# shared memory.
+chains_in_process = None
+
+
+def set_chains(chains):
+    """
+    The function that is called in every process of the pool when it starts, to set the instance of the process.
+    :param chains: an instance of class: MultipleChains.
+    :return: Nothing.
+    """
+    global chains_in_process
+    chains_in_process = chains
+
+
+def sample_chain(arguments):
+    """
+    The function that is run by the processes of the pool to run one chain.
+    :param arguments: tuple of index of chain and seed of random number generator.
+    :return: tuple of alpha and beta of the chain at the end.
+    """
+    chain, seed = arguments
+    return chains_in_process.sample_chain(chain=chain, seed=seed)
+
+
+def linear_assignment(cost):
+    """
+    The function that solves the linear assignment problem by the Hungarian algorithm with potentials, in O(n^3).
+    :param cost: an n * n numpy array, [i][j] refers the cost of assigning row i to column j.
+    :return: an numpy array, [i] refers the column assigned to row i, so that the sum of costs is the minimum.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    n = cost.shape[0]
+    # potentials of rows and columns, and [j] refers the row assigned to column j. Index 0 is a virtual column.
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    row_of_column = np.zeros(n + 1, dtype=np.int64)
+    way = np.zeros(n + 1, dtype=np.int64)
+    for i in range(1, n + 1, 1):
+        row_of_column[0] = i
+        column = 0
+        minimum = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[column] = True
+            row = row_of_column[column]
+            free = ~used[1:]
+            reduced = cost[row - 1] - u[row] - v[1:]
+            better = free & (reduced < minimum[1:])
+            minimum[1:][better] = reduced[better]
+            way[1:][better] = column
+            candidates = np.where(free, minimum[1:], np.inf)
+            next_column = int(candidates.argmin()) + 1
+            delta = candidates[next_column - 1]
+            u[row_of_column[used]] += delta
+            v[used] -= delta
+            minimum[1:][free] -= delta
+            column = next_column
+            if row_of_column[column] == 0:
+                break
+            else:
+                pass
+        # augment along the alternating path.
+        while column != 0:
+            previous_column = way[column]
+            row_of_column[column] = row_of_column[previous_column]
+            column = previous_column
+    assignment = np.zeros(n, dtype=np.int64)
+    assignment[row_of_column[1:] - 1] = np.arange(0, n, 1)
+    return assignment
+
+
+class MultipleChains(object):
+    """
+    The class, which runs several independent chains of Gibbs Sampling with different seeds in parallel processes. The
+    processes are forked after the corpus is loaded, so they read the same corpus without copying it.
+
+    The topics of different chains are not in the same order, so the topics of every chain are matched to the topics
+    of the first chain by the Hungarian algorithm on the Bhattacharyya coefficient of their distributions over terms,
+        sum_t sqrt(phi_1[k][t] * phi_c[j][t])
+    and the matched distributions of all chains are averaged. The mean coefficient of the matched topics is the
+    stability of a topic: 1 means all chains found it, a small value means it depends on the chain.
+    """
+    def __init__(self,corpus,topic_number=10,iteration_number=1000,burn_in=500,update_cycle=100,alpha=None,beta=None,
+                 chains=4,workers=None,sampler='gibbs',sample_arguments=None):
+        """
+        The method that initializes an instance of the class. The parameters are the same as GibbsSampler, except:
+        :param chains: number of chains. Default value is 4.
+        :param workers: number of processes. Default value is None, which means the number of chains, but not more
+                        than the number of processors.
+        :param sampler: 'gibbs' for GibbsSampler or 'sparse' for SparseGibbsSampler. Default value is 'gibbs'.
+        :param sample_arguments: dict of parameters of gibbs_sample of every chain, such as monitor_cycle or
+                                 optimize_cycle. Default value is None.
+        """
+        if sampler == 'gibbs':
+            self.sampler_class = GibbsSampler
+        elif sampler == 'sparse':
+            self.sampler_class = SparseGibbsSampler
+        else:
+            raise ValueError('unsupported sampler: ' + str(sampler))
+        self.corpus = corpus
+        self.topic_number = topic_number
+        self.iteration_number = iteration_number
+        self.burn_in = burn_in
+        self.update_cycle = update_cycle
+        self.alpha = alpha
+        self.beta = beta
+        self.chains = chains
+        if workers == None:
+            workers = min(chains, multiprocessing.cpu_count())
+        else:
+            pass
+        self.workers = workers
+        self.sample_arguments = sample_arguments if sample_arguments != None else {}
+        # the distributions of all chains, in shared memory, [c][k][t] and [c][m][k].
+        self.chain_topic_distribution_over_term = None
+        self.chain_document_distribution_over_topic = None
+        # [c][k] refers the topic of chain c that is matched to topic k of the first chain.
+        self.topic_alignment = None
+        # [k] refers the stability of topic k, the mean Bhattacharyya coefficient of the matched topics.
+        self.topic_stability = None
+        # distribution matrix, [m][k] refers the probability that assigning topic k to document m.
+        self.document_distribution_over_topic = None
+        # distribution matrix, [k][t] refers the probability that assigning topic k to term t.
+        self.topic_distribution_over_term = None
+
+    def sample(self):
+        """
+        The method that runs all chains in a pool of processes, and combines their distributions.
+        :return: Nothing.
+        """
+        term_number = len(self.corpus.word_id)
+        document_number = len(self.corpus.documents)
+        self.chain_topic_distribution_over_term = shared_array((self.chains, self.topic_number, term_number),
+                                                               dtype=np.float32)
+        self.chain_document_distribution_over_topic = shared_array((self.chains, document_number, self.topic_number),
+                                                                   dtype=np.float32)
+        # the seeds are drawn from the random number generator of the main process, so that runs are reproducible.
+        seeds = [random.randint(0, 2 ** 31 - 1) for chain in range(0, self.chains, 1)]
+        pool = fork_pool(processes=self.workers, initializer=set_chains, initargs=(self,))
+        try:
+            hyperparameters = pool.map(sample_chain, zip(range(0, self.chains, 1), seeds), chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        self.combine()
+        # the hyperparameters of the chains, which differ if they are optimized, are averaged as the topics.
+        self.alpha = np.mean([hyperparameters[chain][0][self.topic_alignment[chain]]
+                              for chain in range(0, self.chains, 1)], axis=0)
+        self.beta = np.mean([hyperparameters[chain][1] for chain in range(0, self.chains, 1)], axis=0)
+
+    def sample_chain(self, chain, seed):
+        """
+        The method that runs one chain and writes its distributions to shared memory. It is run in a process of the
+        pool.
+        :param chain: index of the chain.
+        :param seed: seed of random number generator.
+        :return: tuple of alpha and beta of the chain at the end.
+        """
+        random.seed(seed)
+        sampler = self.sampler_class(corpus=self.corpus,topic_number=self.topic_number,
+                                     iteration_number=self.iteration_number,burn_in=self.burn_in,
+                                     update_cycle=self.update_cycle,alpha=self.alpha,beta=self.beta)
+        sampler.gibbs_sample(**self.sample_arguments)
+        self.chain_topic_distribution_over_term[chain] = sampler.get_topic_distribution_over_term()
+        self.chain_document_distribution_over_topic[chain] = sampler.get_document_distribution_over_topic()
+        return sampler.alpha, sampler.beta
+
+    def combine(self):
+        """
+        The method that matches the topics of every chain to the topics of the first chain, averages the matched
+        distributions and calculates the stability of topics.
+        :return: Nothing.
+        """
+        reference = np.sqrt(self.chain_topic_distribution_over_term[0], dtype=np.float64)
+        self.topic_alignment = np.zeros((self.chains, self.topic_number), dtype=np.int64)
+        self.topic_alignment[0] = np.arange(0, self.topic_number, 1)
+        similarity_sum = np.zeros(self.topic_number, dtype=np.float64)
+        for chain in range(1, self.chains, 1):
+            # [k][j] refers the Bhattacharyya coefficient of topic k of the first chain and topic j of this chain.
+            similarity = reference.dot(np.sqrt(self.chain_topic_distribution_over_term[chain], dtype=np.float64).T)
+            self.topic_alignment[chain] = linear_assignment(-similarity)
+            similarity_sum += similarity[np.arange(0, self.topic_number, 1), self.topic_alignment[chain]]
+        self.topic_distribution_over_term = np.zeros(self.chain_topic_distribution_over_term.shape[1:],
+                                                     dtype=np.float32)
+        self.document_distribution_over_topic = np.zeros(self.chain_document_distribution_over_topic.shape[1:],
+                                                         dtype=np.float32)
+        for chain in range(0, self.chains, 1):
+            self.topic_distribution_over_term += self.chain_topic_distribution_over_term[chain][
+                self.topic_alignment[chain]]
+            self.document_distribution_over_topic += self.chain_document_distribution_over_topic[chain][
+                :, self.topic_alignment[chain]]
+        self.topic_distribution_over_term /= self.chains
+        self.document_distribution_over_topic /= self.chains
+        if self.chains > 1:
+            self.topic_stability = similarity_sum / (self.chains - 1)
+        else:
+            self.topic_stability = np.ones(self.topic_number, dtype=np.float64)
+
+    def get_topic_distribution_over_term(self):
+        """
+        The method that gets the averaged distribution of topics over terms.
+        :return: The distribution of topics over terms.
+        """
+        return self.topic_distribution_over_term
+
+    def get_document_distribution_over_topic(self):
+        """
+        The method that gets the averaged distribution of documents over topics.
+        :return: The distribution of documents over topics.
+        """
+        return self.document_distribution_over_topic
+
+    def get_topic_stability(self):
+        """
+        The method that gets the stability of topics across chains.
+        :return: an numpy array, [k] refers the mean Bhattacharyya coefficient of topic k and its matched topics.
+        """
+        return self.topic_stability
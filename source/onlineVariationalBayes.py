@@ -0,0 +1,199 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the class: OnlineVariationalBayes for LDA model, which realizes online variational Bayes
+(Hoffman, Blei and Bach, 2010).
+"""
+import sys
+import random
+import numpy as np
+from specialFunctions import digamma
+from instrumentation import get_logger
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+logger = get_logger('onlineVariationalBayes')
+
+
+class OnlineVariationalBayes(object):
+    """
+    The class, which is used to inference for LDA model by online variational Bayes. The documents are read in
+    batches, and after each batch the variational parameter of topics over terms, lambda, is moved towards the estimate
+    from the batch with the learning rate (tau0 + t) ^ (-kappa), where t is the number of batches that have been read.
+    Only lambda and one batch are in memory, so the corpus can be read from a file while training.
+    """
+    def __init__(self,corpus,topic_number=10,alpha=None,beta=0.1,batch_size=256,tau0=1024.0,kappa=0.7,
+                 pass_number=1,corpus_file=None,sep=' ',iteration_number=100,tolerance=0.001):
+        """
+        The method that initializes an instance of the class.
+        :param corpus: an instance of class: Corpus. Its documents are trained if corpus_file is None, otherwise the
+                       words of corpus_file are added to its vocabulary.
+        :param topic_number: number of topic in LDA model.
+        :param alpha: an vector, parameter of LDA, which determines the distribution of documents over topics and whose
+                      length is equal to the number of topics. Default value is None, which means 1 / topic_number.
+        :param beta: parameter of LDA, which determines the distribution of topics over terms, the same for all terms
+                     because the vocabulary may grow while reading. Default value is 0.1.
+        :param batch_size: number of documents in a batch. Default value is 256.
+        :param tau0: delay of the learning rate, which down-weights the first batches. Default value is 1024.
+        :param kappa: decay of the learning rate, in (0.5, 1]. Default value is 0.7.
+        :param pass_number: number of times that the whole corpus is read. Default value is 1.
+        :param corpus_file: the file that contains all documents, one line per document, which is read in batches.
+                            Default value is None, which means the documents of corpus are trained.
+        :param sep: the character between two words in corpus_file. Default value is blank space.
+        :param iteration_number: the maximal number of iterations of the E step of one document. Default value is 100.
+        :param tolerance: the E step of a document stops when the mean change of its parameters is less than it.
+        """
+        self.corpus = corpus
+        self.topic_number = topic_number
+        if alpha == None:
+            alpha = [1.0 / topic_number] * topic_number
+        else:
+            pass
+        self.alpha = np.asarray(alpha, dtype=np.float64)
+        self.beta = beta
+        self.batch_size = batch_size
+        self.tau0 = tau0
+        self.kappa = kappa
+        self.pass_number = pass_number
+        self.corpus_file = corpus_file
+        self.sep = sep
+        self.iteration_number = iteration_number
+        self.tolerance = tolerance
+        self.random_state = np.random.RandomState(random.randint(0, 2 ** 31 - 1))
+        # number of documents in the corpus, which scales the estimate from one batch.
+        if corpus_file == None:
+            self.document_number = len(corpus.documents)
+        else:
+            file = open(corpus_file, mode='r')
+            self.document_number = sum(1 for line in file)
+            file.close()
+        # variational parameter of topics over terms, [k][t].
+        self.topic_term_lambda = self.random_lambda(len(corpus.word_id))
+        # exp(E[log phi]) under the variational distribution, [k][t].
+        self.exp_log_topic_term = None
+        # variational parameter of documents over topics, [m][k], from the last time that document m was read.
+        self.document_gamma = np.zeros((self.document_number, topic_number), dtype=np.float64)
+        # the number of batches that have been read.
+        self.update_number = 0
+        # distribution matrix, [m][k] refers the probability that assigning topic k to document m.
+        self.document_distribution_over_topic = None
+        # distribution matrix, [k][t] refers the probability that assigning topic k to term t.
+        self.topic_distribution_over_term = None
+
+    def random_lambda(self, term_number):
+        """
+        The method that draws the initial variational parameter of topics over some terms.
+        :param term_number: number of terms.
+        :return: an K * term_number numpy array.
+        """
+        return self.random_state.gamma(100.0, 1.0 / 100.0, (self.topic_number, term_number))
+
+    def train(self):
+        """
+        The method that reads all documents pass_number times, updates lambda after each batch, and calculates the
+        final distributions.
+        :return: Nothing.
+        """
+        self.update_exp_log_topic_term()
+        for pass_index in range(0, self.pass_number, 1):
+            if self.corpus_file == None:
+                batches = self.corpus.iterate_batches(batch_size=self.batch_size)
+            else:
+                batches = self.corpus.stream_file_corpus(corpus_file=self.corpus_file, sep=self.sep,
+                                                         batch_size=self.batch_size)
+            first_document = 0
+            for documents in batches:
+                self.update_batch(documents=documents, first_document=first_document)
+                first_document += len(documents)
+            logger.info('pass: %d batches: %d', pass_index, self.update_number)
+        self.get_distribution()
+
+    def update_batch(self, documents, first_document):
+        """
+        The method that runs the E step on a batch of documents and moves lambda towards the estimate from the batch.
+        :param documents: list of documents, each of which is a list or numpy array of id of words.
+        :param first_document: id of the first document of the batch.
+        :return: Nothing.
+        """
+        # the vocabulary may have grown while reading the batch.
+        term_number = len(self.corpus.word_id)
+        if term_number > self.topic_term_lambda.shape[1]:
+            self.topic_term_lambda = np.hstack([self.topic_term_lambda,
+                                                self.random_lambda(term_number - self.topic_term_lambda.shape[1])])
+            self.update_exp_log_topic_term()
+        else:
+            pass
+        statistics = np.zeros(self.topic_term_lambda.shape, dtype=np.float64)
+        for index in range(0, len(documents), 1):
+            terms, counts = np.unique(np.asarray(documents[index], dtype=np.int64), return_counts=True)
+            gamma, document_statistics = self.e_step(terms=terms, counts=counts)
+            self.document_gamma[first_document + index] = gamma
+            statistics[:, terms] += document_statistics
+        statistics *= self.exp_log_topic_term
+        # learning rate of this batch.
+        rho = (self.tau0 + self.update_number) ** (-self.kappa)
+        self.topic_term_lambda *= 1 - rho
+        self.topic_term_lambda += rho * (self.beta + self.document_number * statistics / len(documents))
+        self.update_exp_log_topic_term()
+        self.update_number += 1
+
+    def e_step(self, terms, counts):
+        """
+        The method that fits the variational parameters of one document with lambda fixed.
+        :param terms: numpy array of id of distinct terms in the document.
+        :param counts: numpy array of number of times that each term appears in the document.
+        :return: tuple of gamma of the document, and its sufficient statistics over the terms, an K * len(terms)
+                 array, which is to be multiplied by exp(E[log phi]).
+        """
+        gamma = self.random_state.gamma(100.0, 1.0 / 100.0, self.topic_number)
+        exp_log_theta = np.exp(digamma(gamma) - digamma(gamma.sum()))
+        exp_log_phi = self.exp_log_topic_term[:, terms]
+        normalizer = exp_log_theta.dot(exp_log_phi) + 1e-100
+        for iteration_index in range(0, self.iteration_number, 1):
+            last_gamma = gamma
+            gamma = self.alpha + exp_log_theta * (counts / normalizer).dot(exp_log_phi.T)
+            exp_log_theta = np.exp(digamma(gamma) - digamma(gamma.sum()))
+            normalizer = exp_log_theta.dot(exp_log_phi) + 1e-100
+            if np.abs(gamma - last_gamma).mean() < self.tolerance:
+                break
+            else:
+                pass
+        return gamma, np.outer(exp_log_theta, counts / normalizer)
+
+    def update_exp_log_topic_term(self):
+        """
+        The method that calculates exp(E[log phi]) from lambda.
+        :return: Nothing.
+        """
+        if self.topic_term_lambda.shape[1] > 0:
+            self.exp_log_topic_term = np.exp(digamma(self.topic_term_lambda) -
+                                             digamma(self.topic_term_lambda.sum(axis=1))[:, np.newaxis])
+        else:
+            self.exp_log_topic_term = np.zeros(self.topic_term_lambda.shape)
+
+    def get_distribution(self):
+        """
+        The method that calculates final distribution, the means of the variational distributions, as float32
+        arrays.
+        :return: Nothing.
+        """
+        self.topic_distribution_over_term = np.empty(self.topic_term_lambda.shape, dtype=np.float32)
+        np.divide(self.topic_term_lambda, self.topic_term_lambda.sum(axis=1)[:, np.newaxis],
+                  out=self.topic_distribution_over_term)
+        self.document_distribution_over_topic = np.empty(self.document_gamma.shape, dtype=np.float32)
+        np.divide(self.document_gamma, self.document_gamma.sum(axis=1)[:, np.newaxis],
+                  out=self.document_distribution_over_topic)
+
+    def get_topic_distribution_over_term(self):
+        """
+        The method that gets the distribution of topics over terms.
+        :return: The distribution of topics over terms.
+        """
+        return self.topic_distribution_over_term
+
+    def get_document_distribution_over_topic(self):
+        """
+        The method that gets the distribution of documents over topics.
+        :return: The distribution of documents over topics.
+        """
+        return self.document_distribution_over_topic
@@ -0,0 +1,239 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the class: ParallelGibbsSampler for LDA model, which realizes approximate distributed LDA
+(AD-LDA, Newman et al., 2009) on a pool of processes.
+"""
+import sys
+import os
+import random
+import multiprocessing
+import numpy as np
+from gibbsSampler import GibbsSampler
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+# the sampler whose shards are sampled by the processes of the pool, which is set in every process by set_sampler. The
+# processes are forked, so they share its counters, which are allocated in shared memory.
+sampler_in_process = None
+
+
+def fork_pool(processes, initializer, initargs):
+    """
+    The function that starts a pool of processes forked from this process, which share the objects and the shared
+    memory of this process. It is not available where processes are spawned instead of forked, such as Windows.
+    :param processes: number of processes.
+    :param initializer: the function that is called in every process with initargs.
+    :param initargs: tuple of parameters of initializer.
+    :return: an instance of class: multiprocessing.Pool.
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError('parallel processes share memory by fork, which is not available on platform: ' +
+                           sys.platform + ', please use one process')
+    else:
+        pass
+    return multiprocessing.Pool(processes=processes, initializer=initializer, initargs=initargs)
+
+
+def set_sampler(sampler):
+    """
+    The function that is called in every process of the pool when it starts, to set the sampler of the process.
+    :param sampler: an instance of class: ParallelGibbsSampler.
+    :return: Nothing.
+    """
+    global sampler_in_process
+    sampler_in_process = sampler
+
+
+def sample_shard(arguments):
+    """
+    The function that is run by the processes of the pool to sample one shard of documents.
+    :param arguments: tuple of index of shard and seed of random number generator.
+    :return: Nothing.
+    """
+    shard, seed = arguments
+    sampler_in_process.sample_shard(shard=shard, seed=seed)
+
+
+def shared_array(shape, dtype=np.int32):
+    """
+    The function that allocates an array filled with zeros in shared memory, which is shared with forked processes.
+    :param shape: shape of the array.
+    :param dtype: type of elements of the array.
+    :return: an numpy array whose memory is shared.
+    """
+    size = int(np.prod(shape))
+    buffer = multiprocessing.RawArray('b', max(size, 1) * np.dtype(dtype).itemsize)
+    return np.frombuffer(buffer, dtype=dtype, count=size).reshape(shape)
+
+
+class ParallelGibbsSampler(GibbsSampler):
+    """
+    The class, which is used to inference for LDA model by Gibbs Sampling on several processes.
+
+    The documents are split into shards with about the same number of words. In each iteration, each process samples
+    one shard against its own copy of the counter of topics over terms, then the changes of all copies are merged into
+    the global counter. The counters of documents and the topics assigned to words are only changed by the process
+    that owns the document, so they are written to shared memory directly and never copied.
+    """
+    def __init__(self,corpus,topic_number=10,iteration_number=1000,burn_in=500,update_cycle=100,alpha=None,beta=None,
+                 workers=2):
+        """
+        The method that initializes an instance of the class. The parameters are the same as GibbsSampler, except:
+        :param workers: number of processes, which is also the number of shards of documents. Default value is 2.
+        """
+        GibbsSampler.__init__(self,corpus=corpus,topic_number=topic_number,iteration_number=iteration_number,
+                              burn_in=burn_in,update_cycle=update_cycle,alpha=alpha,beta=beta)
+        self.workers = workers
+        # list of documents of each shard.
+        self.shards = self.split_documents(workers)
+        # the copy of the counter of topics over terms that is sampled by each shard, in shared memory.
+        self.shard_topic_term_count_matrix = []
+        # the pool of processes.
+        self.pool = None
+
+    def split_documents(self, shard_number):
+        """
+        The method that splits the documents into continuous shards, whose numbers of words are about the same.
+        :param shard_number: number of shards.
+        :return: list of shards, each of which is a list of id of documents.
+        """
+        lengths = np.diff(self.document_offsets)
+        boundaries = np.searchsorted(lengths.cumsum(), lengths.sum() * np.arange(1, shard_number) / float(shard_number))
+        return [shard.tolist() for shard in np.split(np.arange(self.document_number), boundaries)]
+
+    def initialize(self):
+        """
+        The method that initializes the initial state of Markov Chain in shared memory.
+        :return: Nothing.
+        """
+        GibbsSampler.initialize(self)
+        self.share_counters()
+
+    def load_checkpoint(self, checkpoint_file):
+        """
+        The method that restores the state of sampler saved by save_checkpoint, and moves it to shared memory.
+        :param checkpoint_file: the file where the state is saved.
+        :return: number of iterations that had been done when the state was saved.
+        """
+        iteration_number = GibbsSampler.load_checkpoint(self, checkpoint_file)
+        self.share_counters()
+        return iteration_number
+
+    def share_counters(self):
+        """
+        The method that moves the counters and the topics assigned to words to shared memory, and allocates the copies
+        of the counter of topics over terms for the shards.
+        :return: Nothing.
+        """
+        document_topic_count_matrix = shared_array(self.document_topic_count_matrix.shape)
+        document_topic_count_matrix[:] = self.document_topic_count_matrix
+        self.document_topic_count_matrix = document_topic_count_matrix
+        sum_topic_by_term_count = shared_array(self.sum_topic_by_term_count.shape)
+        sum_topic_by_term_count[:] = self.sum_topic_by_term_count
+        self.sum_topic_by_term_count = sum_topic_by_term_count
+        # the counters of topics over terms are column-major, as GibbsSampler's.
+        topic_term_count_matrix = shared_array((self.term_number, self.topic_number)).T
+        topic_term_count_matrix[:] = self.topic_term_count_matrix
+        self.topic_term_count_matrix = topic_term_count_matrix
+        self.shard_topic_term_count_matrix = []
+        for shard in range(0, self.workers, 1):
+            self.shard_topic_term_count_matrix.append(shared_array((self.term_number, self.topic_number)).T)
+        word_topic_assignment = shared_array(self.word_topic_assignment.shape)
+        word_topic_assignment[:] = self.word_topic_assignment
+        self.word_topic_assignment = word_topic_assignment
+
+    def add_documents(self, corpus, beta=None):
+        """
+        The method that extends the state of Markov Chain to the documents and terms that have been added to the corpus,
+        splits the documents into shards again and moves the state to shared memory. The pool of processes has been
+        closed by gibbs_sample, so the new documents are sampled in this process.
+        :param corpus: the instance of class: Corpus that the sampler was created with.
+        :param beta: parameter of LDA for the new terms. Default value is None, which means the same as the last term.
+        :return: list of id of the new documents.
+        """
+        document_list = GibbsSampler.add_documents(self, corpus=corpus, beta=beta)
+        self.shards = self.split_documents(self.workers)
+        self.share_counters()
+        return document_list
+
+    def iterate_gibbs_sample(self, checkpoint_file=None, checkpoint_cycle=50, resume=False, monitor_cycle=None,
+                             tolerance=None, held_out_documents=None, optimize_cycle=None, optimize_beta=False):
+        """
+        The generator that realizes the Gibbs Sampling, and closes the pool of processes when it ends. The parameters
+        and the statistics are the same as GibbsSampler.iterate_gibbs_sample.
+        """
+        try:
+            for statistics in GibbsSampler.iterate_gibbs_sample(self, checkpoint_file=checkpoint_file,
+                                                                checkpoint_cycle=checkpoint_cycle, resume=resume,
+                                                                monitor_cycle=monitor_cycle, tolerance=tolerance,
+                                                                held_out_documents=held_out_documents,
+                                                                optimize_cycle=optimize_cycle,
+                                                                optimize_beta=optimize_beta):
+                yield statistics
+        finally:
+            self.close_pool()
+
+    def close_pool(self):
+        """
+        The method that closes the pool of processes, if it has been started.
+        :return: Nothing.
+        """
+        if self.pool != None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        else:
+            pass
+
+    def optimize_hyperparameters(self, optimize_beta=False, iteration_number=20, tolerance=1e-6):
+        """
+        The method that optimizes the hyperparameters as GibbsSampler does, and closes the pool of processes, whose
+        copies of the sampler have the old hyperparameters. The pool is forked again by the next sweep.
+        :return: Nothing.
+        """
+        GibbsSampler.optimize_hyperparameters(self, optimize_beta=optimize_beta, iteration_number=iteration_number,
+                                              tolerance=tolerance)
+        self.close_pool()
+
+    def sweep(self):
+        """
+        The method that samples all shards in parallel once, and merges the changes of the counters of topics over
+        terms.
+        :return: Nothing.
+        """
+        if self.pool == None:
+            # the processes are forked here, after the counters have been moved to shared memory.
+            self.pool = fork_pool(processes=self.workers, initializer=set_sampler, initargs=(self,))
+        else:
+            pass
+        # the seeds are drawn from the random number generator of the main process, so that runs are reproducible.
+        seeds = [random.randint(0, 2 ** 31 - 1) for shard in range(0, self.workers, 1)]
+        self.pool.map(sample_shard, zip(range(0, self.workers, 1), seeds))
+        # global = global + sum(shard - global), where the copy of every shard holds its change after sampling.
+        for shard_topic_term_count_matrix in self.shard_topic_term_count_matrix:
+            np.add(self.topic_term_count_matrix, shard_topic_term_count_matrix, out=self.topic_term_count_matrix)
+        self.sum_topic_by_term_count[:] = self.topic_term_count_matrix.sum(axis=1)
+
+    def sample_shard(self, shard, seed):
+        """
+        The method that samples all documents of one shard against a copy of the global counter of topics over terms,
+        and leaves the change of the copy in it, which is merged by sweep. It is run in a process of the pool.
+        :param shard: index of the shard.
+        :param seed: seed of random number generator.
+        :return: Nothing.
+        """
+        random.seed(seed)
+        topic_term_count_matrix = self.shard_topic_term_count_matrix[shard]
+        topic_term_count_matrix[:] = self.topic_term_count_matrix
+        # the copy of the sampler in this process samples the local copy of counters.
+        global_topic_term_count_matrix = self.topic_term_count_matrix
+        global_sum_topic_by_term_count = self.sum_topic_by_term_count
+        self.topic_term_count_matrix = topic_term_count_matrix
+        self.sum_topic_by_term_count = global_sum_topic_by_term_count.copy()
+        try:
+            self.sample_documents(document_list=self.shards[shard])
+        finally:
+            self.topic_term_count_matrix = global_topic_term_count_matrix
+            self.sum_topic_by_term_count = global_sum_topic_by_term_count
+        np.subtract(topic_term_count_matrix, global_topic_term_count_matrix, out=topic_term_count_matrix)
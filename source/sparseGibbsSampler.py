@@ -0,0 +1,316 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the class: SparseGibbsSampler for LDA model, which realizes the SparseLDA sampler.
+"""
+import sys
+import math
+import random
+import numpy as np
+from gibbsSampler import GibbsSampler
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+class SparseGibbsSampler(GibbsSampler):
+    """
+    The class, which is used to inference for LDA model by Gibbs Sampling as SparseLDA does (Yao et al., 2009).
+
+    The full conditional probability of a word w in document m
+        (alpha[k] + n_mk) * (beta[w] + n_kw) / (sum_beta + n_k)
+    is split into three buckets:
+        smoothing:  beta[w] * alpha[k] / (sum_beta + n_k)
+        document:   beta[w] * n_mk / (sum_beta + n_k)                      , only topics with n_mk > 0
+        word:       (alpha[k] + n_mk) * n_kw / (sum_beta + n_k)            , only topics with n_kw > 0
+    The sums of the first two buckets are cached and updated in O(1) when one counter changes, so the cost of sampling a
+    word depends on the number of topics observed in the document and with the word. The smoothing bucket is split into
+    blocks of about sqrt(K) topics whose sums are cached as well, so the rare words that fall in it cost O(sqrt(K)).
+    The chain has the same stationary distribution as GibbsSampler, but not the same random stream.
+    """
+    # the sparse counters are sampled by sample_document for any number of topics.
+    list_kernel_topics = 0
+
+    def __init__(self,corpus,topic_number=10,iteration_number=1000,burn_in=500,update_cycle=100,alpha=None,beta=None):
+        """
+        The method that initializes an instance of the class. The parameters are the same as GibbsSampler.
+        """
+        GibbsSampler.__init__(self,corpus=corpus,topic_number=topic_number,iteration_number=iteration_number,
+                              burn_in=burn_in,update_cycle=update_cycle,alpha=alpha,beta=beta)
+        # sparse counter, [m] is a dict, key: topic k, value: number of words in document m assigned to topic k.
+        self.document_topic_count = {}
+        # sparse counter, [t] is a dict, key: topic k, value: number of times that term t has been assigned to topic k.
+        self.term_topic_count = {}
+        # counter, [k] refers the number of times that all terms have been observed with topic k.
+        self.topic_count = []
+        # sum over all topics of alpha[k] / (sum_beta + n_k), the smoothing bucket without beta[w], which is kept up to
+        # date from one document to the next by sample_documents.
+        self.smoothing = 0.0
+        # [b] refers to the part of smoothing of the topics of block b, [b * block_size, (b + 1) * block_size), kept up to
+        # date as smoothing.
+        self.smoothing_blocks = []
+        self.block_size = max(int(math.sqrt(topic_number)), 1)
+        # [k] refers to (alpha[k] + n_mk) / (sum_beta + n_k) for the document that is sampled, which is alpha[k] /
+        # (sum_beta + n_k) for the topics that are not in it, kept up to date as smoothing.
+        self.coefficient = []
+        # alpha and beta as Python lists, tuple of alpha, beta and their lists, which are made again when alpha or beta
+        # is replaced.
+        self.parameter_cache = None
+
+    def initialize(self):
+        """
+        The method that initializes the initial state of Markov Chain, and builds the sparse counters.
+        :return: Nothing.
+        """
+        GibbsSampler.initialize(self)
+        self.build_sparse_counters()
+
+    def load_checkpoint(self, checkpoint_file):
+        """
+        The method that restores the state of sampler saved by save_checkpoint, and builds the sparse counters from the
+        restored dense counters. The order of topics in the rebuilt sparse counters may differ from the interrupted
+        chain, so the resumed chain is an exact continuation of the state but not of the random stream.
+        :param checkpoint_file: the file where the state is saved.
+        :return: number of iterations that had been done when the state was saved.
+        """
+        iteration_number = GibbsSampler.load_checkpoint(self, checkpoint_file)
+        self.build_sparse_counters()
+        return iteration_number
+
+    def build_sparse_counters(self, document_list=None):
+        """
+        The method that builds the sparse counters from the dense counters.
+        :param document_list: list of id of documents whose counters, and the counters of the terms that occur in them,
+                              are built again. Default value is None, which means all documents and all terms.
+        :return: Nothing.
+        """
+        if document_list == None:
+            document_list = range(0, self.document_number, 1)
+            self.term_topic_count = dict((term, {}) for term in range(0, self.term_number, 1))
+            topics, terms = np.nonzero(self.topic_term_count_matrix)
+        else:
+            terms = np.unique(self.document_words(document_list))
+            for term in terms.tolist():
+                self.term_topic_count[term] = {}
+            # the counts in the same order as above, so that the topics of a term are visited in the same order.
+            topics, columns = np.nonzero(self.topic_term_count_matrix[:, terms])
+            terms = terms[columns]
+        for m in document_list:
+            topics_of_document = np.flatnonzero(self.document_topic_count_matrix[m])
+            self.document_topic_count[m] = dict(zip(topics_of_document.tolist(),
+                                                    self.document_topic_count_matrix[m, topics_of_document].tolist()))
+        counts = self.topic_term_count_matrix[topics, terms]
+        for topic, term, count in zip(topics.tolist(), terms.tolist(), counts.tolist()):
+            self.term_topic_count[term][topic] = count
+        self.topic_count = self.sum_topic_by_term_count.tolist()
+
+    def sample_documents(self, document_list):
+        """
+        The method that changes the state of all words in some documents once, then copies the sparse counters of the
+        documents and of their terms back to the dense counters. The smoothing bucket and the coefficients of the
+        topics are computed once per call, in O(K), and each document only changes the coefficients of its own topics, so
+        the cost of a document does not depend on the number of terms and grows with sqrt(K) only in the smoothing
+        bucket.
+        :param document_list: list of id of documents.
+        :return: Nothing.
+        """
+        alpha = self.parameter_lists()[0]
+        sum_beta = self.sum_beta
+        topic_count = self.topic_count
+        # recomputed for every call to avoid accumulating errors.
+        self.coefficient = [alpha[k] / (sum_beta + topic_count[k]) for k in range(0, self.topic_number, 1)]
+        self.smoothing_blocks = [sum(self.coefficient[start:start + self.block_size])
+                                 for start in range(0, self.topic_number, self.block_size)]
+        self.smoothing = sum(self.smoothing_blocks)
+        for m in document_list:
+            self.sample_document(m=m)
+        self.synchronize_counters(document_list=document_list)
+
+    def parameter_lists(self):
+        """
+        The method that gets alpha and beta as Python lists, which are made once until alpha or beta is replaced.
+        :return: tuple of the lists of alpha and beta.
+        """
+        if self.parameter_cache == None or self.parameter_cache[0] is not self.alpha or \
+                self.parameter_cache[1] is not self.beta:
+            self.parameter_cache = (self.alpha, self.beta, self.alpha.tolist(), self.beta.tolist())
+        else:
+            pass
+        return self.parameter_cache[2], self.parameter_cache[3]
+
+    def add_documents(self, corpus, beta=None):
+        """
+        The method that extends the state of Markov Chain to the documents and terms that have been added to the corpus,
+        and adds the new documents, the new terms and the words of the new documents to the sparse counters.
+        :param corpus: the instance of class: Corpus that the sampler was created with.
+        :param beta: parameter of LDA for the new terms. Default value is None, which means the same as the last term.
+        :return: list of id of the new documents.
+        """
+        old_term_number = self.term_number
+        document_list = GibbsSampler.add_documents(self, corpus=corpus, beta=beta)
+        for term in range(old_term_number, self.term_number, 1):
+            self.term_topic_count[term] = {}
+        self.build_sparse_counters(document_list=document_list)
+        return document_list
+
+    def sample_document(self, m):
+        """
+        The method that changes topics assigned to all words of document m by the three buckets. It is called by
+        sample_documents, which prepares smoothing and coefficient.
+        :param m: document m.
+        :return: Nothing.
+        """
+        start = self.document_offsets[m]
+        end = self.document_offsets[m + 1]
+        document = self.tokens[start:end].tolist()
+        topics = self.word_topic_assignment[start:end].tolist()
+        document_count = self.document_topic_count[m]
+        term_topic_count = self.term_topic_count
+        topic_count = self.topic_count
+        alpha, beta = self.parameter_lists()
+        sum_beta = self.sum_beta
+        uniform = random.uniform
+        smoothing = self.smoothing
+        smoothing_blocks = self.smoothing_blocks
+        block_size = self.block_size
+        coefficient = self.coefficient
+        # sum of the document bucket without beta[w].
+        document_bucket = 0.0
+        for k, count in document_count.iteritems():
+            document_bucket += count / (sum_beta + topic_count[k])
+            coefficient[k] = (alpha[k] + count) / (sum_beta + topic_count[k])
+        for n in range(0, len(document), 1):
+            term = document[n]
+            topic = topics[n]
+            term_count = term_topic_count[term]
+            # remove the word from the counters and the cached sums.
+            denominator = sum_beta + topic_count[topic]
+            change = - alpha[topic] / denominator
+            document_bucket -= document_count[topic] / denominator
+            topic_count[topic] -= 1
+            self.decrease(document_count, topic)
+            self.decrease(term_count, topic)
+            denominator = sum_beta + topic_count[topic]
+            change += alpha[topic] / denominator
+            smoothing += change
+            smoothing_blocks[topic // block_size] += change
+            document_bucket += document_count.get(topic, 0) / denominator
+            coefficient[topic] = (alpha[topic] + document_count.get(topic, 0)) / denominator
+
+            # the word bucket, which only contains the topics observed with the term.
+            word_bucket = 0.0
+            for k, count in term_count.iteritems():
+                word_bucket += coefficient[k] * count
+            beta_term = beta[term]
+            random_double = uniform(0, 1) * (word_bucket + beta_term * (smoothing + document_bucket))
+            topic = -1
+            if random_double < word_bucket:
+                for k, count in term_count.iteritems():
+                    topic = k
+                    random_double -= coefficient[k] * count
+                    if random_double < 0:
+                        break
+            else:
+                random_double = (random_double - word_bucket) / beta_term
+                if random_double < document_bucket:
+                    for k, count in document_count.iteritems():
+                        topic = k
+                        random_double -= count / (sum_beta + topic_count[k])
+                        if random_double < 0:
+                            break
+                else:
+                    # the block of the topic, then the topic in the block.
+                    random_double -= document_bucket
+                    block = len(smoothing_blocks) - 1
+                    for b in range(0, len(smoothing_blocks) - 1, 1):
+                        if random_double < smoothing_blocks[b]:
+                            block = b
+                            break
+                        else:
+                            random_double -= smoothing_blocks[b]
+                    for k in range(block * block_size, min((block + 1) * block_size, self.topic_number), 1):
+                        topic = k
+                        random_double -= alpha[k] / (sum_beta + topic_count[k])
+                        if random_double < 0:
+                            break
+            if topic == -1:
+                # the bucket was empty because of rounding, fall back to the smoothing bucket.
+                topic = int(uniform(0, 1) * self.topic_number)
+            else:
+                pass
+
+            # add the word to the counters and the cached sums with its new topic.
+            denominator = sum_beta + topic_count[topic]
+            change = - alpha[topic] / denominator
+            document_bucket -= document_count.get(topic, 0) / denominator
+            topic_count[topic] += 1
+            document_count[topic] = document_count.get(topic, 0) + 1
+            term_count[topic] = term_count.get(topic, 0) + 1
+            denominator = sum_beta + topic_count[topic]
+            change += alpha[topic] / denominator
+            smoothing += change
+            smoothing_blocks[topic // block_size] += change
+            document_bucket += document_count[topic] / denominator
+            coefficient[topic] = (alpha[topic] + document_count[topic]) / denominator
+            topics[n] = topic
+        self.word_topic_assignment[start:end] = topics
+        # the coefficients of the topics of the document go back to the ones without the document.
+        for k in document_count:
+            coefficient[k] = alpha[k] / (sum_beta + topic_count[k])
+        self.smoothing = smoothing
+
+    def sample_by_full_condition(self, m, n):
+        """
+        The method that changes topic assigned to the n th word of document m. The dense counters are sampled as
+        GibbsSampler does, and the sparse counters are kept in sync with them.
+        :param m: document m.
+        :param n: sequence of word in document m.
+        :return: Nothing.
+        """
+        index = self.document_offsets[m] + n
+        term = int(self.tokens[index])
+        topic = int(self.word_topic_assignment[index])
+        GibbsSampler.sample_by_full_condition(self, m=m, n=n)
+        new_topic = int(self.word_topic_assignment[index])
+        self.decrease(self.document_topic_count[m], topic)
+        self.decrease(self.term_topic_count[term], topic)
+        self.topic_count[topic] -= 1
+        self.document_topic_count[m][new_topic] = self.document_topic_count[m].get(new_topic, 0) + 1
+        self.term_topic_count[term][new_topic] = self.term_topic_count[term].get(new_topic, 0) + 1
+        self.topic_count[new_topic] += 1
+
+    def synchronize_counters(self, document_list=None):
+        """
+        The method that copies the sparse counters to the dense counters, which are used to calculate distributions.
+        Only the counts of the sampled documents and of the terms that occur in them can have changed.
+        :param document_list: list of id of the sampled documents. Default value is None, which means all documents.
+        :return: Nothing.
+        """
+        if document_list == None:
+            document_list = range(0, self.document_number, 1)
+            terms = range(0, self.term_number, 1)
+        else:
+            terms = np.unique(self.document_words(document_list)).tolist()
+        self.document_topic_count_matrix[document_list] = 0
+        for m in document_list:
+            document_count = self.document_topic_count[m]
+            self.document_topic_count_matrix[m, document_count.keys()] = document_count.values()
+        self.topic_term_count_matrix[:, terms] = 0
+        for term in terms:
+            term_count = self.term_topic_count[term]
+            self.topic_term_count_matrix[term_count.keys(), term] = term_count.values()
+        self.sum_topic_by_term_count[:] = self.topic_count
+
+    @staticmethod
+    def decrease(count_dict, topic):
+        """
+        The method that decreases the count of topic in a sparse counter by one, and removes the topic when its count
+        becomes zero.
+        :param count_dict: the sparse counter.
+        :param topic: the topic whose count is decreased.
+        :return: Nothing.
+        """
+        count = count_dict[topic] - 1
+        if count == 0:
+            del count_dict[topic]
+        else:
+            count_dict[topic] = count
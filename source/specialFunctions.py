@@ -0,0 +1,29 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the special functions that are shared by the inference algorithms of LDA model.
+"""
+import sys
+import numpy as np
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def digamma(x):
+    """
+    The function that calculates the digamma function of positive numbers, by the recurrence
+    digamma(x) = digamma(x + 6) - 1/x - ... - 1/(x + 5) and the asymptotic series of digamma(x + 6).
+    :param x: an numpy array of positive numbers.
+    :return: an numpy array of the same shape.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    result = np.zeros(x.shape)
+    for shift in range(0, 6, 1):
+        result -= 1.0 / (x + shift)
+    x = x + 6
+    inverse_square = 1.0 / (x * x)
+    result += np.log(x) - 0.5 / x - inverse_square * (1.0 / 12 - inverse_square * (1.0 / 120 - inverse_square *
+                                                                                     (1.0 / 252 - inverse_square *
+                                                                                      (1.0 / 240 - inverse_square /
+                                                                                       132))))
+    return result
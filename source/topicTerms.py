@@ -0,0 +1,36 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+The file that defines the functions on the most probable terms of topics, which are shared by LDA model and its model
+selection.
+"""
+import sys
+import numpy as np
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def top_terms(distribution, term_number):
+    """
+    The function that selects the most probable terms of every topic, ordered by probability and then by id of term as
+    a full sort would. All topics are selected in one pass with np.partition, so only the candidates are sorted.
+    :param distribution: an K * V array, the distribution of topics over terms.
+    :param term_number: number of terms of each topic, at most V.
+    :return: tuple of two K * term_number numpy arrays, the ids of terms and their probabilities.
+    """
+    distribution = np.asarray(distribution)
+    term_number = min(term_number, distribution.shape[1])
+    if term_number > 0:
+        # the term_number th largest probability of each topic.
+        threshold = -np.partition(-distribution, term_number - 1, axis=1)[:, term_number - 1]
+    else:
+        threshold = np.full(len(distribution), np.inf)
+    terms = np.zeros((len(distribution), term_number), dtype=np.int64)
+    probabilities = np.zeros((len(distribution), term_number), dtype=distribution.dtype)
+    for topic in range(0, len(distribution), 1):
+        candidates = np.flatnonzero(distribution[topic] >= threshold[topic])
+        # sorted by descending probability, ties by ascending id of term.
+        candidates = candidates[np.lexsort((candidates, -distribution[topic, candidates]))][0:term_number]
+        terms[topic] = candidates
+        probabilities[topic] = distribution[topic, candidates]
+    return terms, probabilities
@@ -0,0 +1,261 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+This is used to measure the performance of the hot paths of LDA: loading corpus, Gibbs Sampling, updating and
+calculating distributions, and outputting topics. The corpora are synthetic, generated by the generative process of LDA
+at controlled sizes, or the bundled corpus in data/ with the option --reduced. The results are written to a json file,
+so that the results of two runs can be compared. Run it from the root of the project:
+    python -m test.benchmark --output benchmark.json
+"""
+import sys
+import os
+import gc
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import datetime
+import numpy as np
+from source.corpus import Corpus
+from source.lda import LDA
+from source.gibbsSampler import GibbsSampler
+from source.sparseGibbsSampler import SparseGibbsSampler
+from source.instrumentation import memory_status
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+# the sizes of synthetic corpora, each of which is measured separately.
+SIZES = [
+    {'documents': 1000, 'terms': 5000, 'length': 100, 'topics': 10},
+    {'documents': 2000, 'terms': 10000, 'length': 200, 'topics': 20},
+    {'documents': 4000, 'terms': 20000, 'length': 200, 'topics': 50},
+]
+# the bundled corpus, which is measured with the option --reduced.
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def generate_documents(document_number, term_number, document_length, topic_number, seed=0):
+    """
+    The function that generates the words of synthetic documents by the generative process of LDA, so that the counters
+    are as sparse as those of real corpora.
+    :param document_number: number of documents.
+    :param term_number: number of terms in the vocabulary.
+    :param document_length: number of words in each document.
+    :param topic_number: number of topics.
+    :param seed: seed of random number generator.
+    :return: list of documents, each of which is a list of words.
+    """
+    random_state = np.random.RandomState(seed)
+    topic_term = random_state.dirichlet([0.01] * term_number, topic_number).cumsum(axis=1)
+    documents = []
+    for m in range(0, document_number, 1):
+        topics = random_state.choice(topic_number, document_length, p=random_state.dirichlet([0.1] * topic_number))
+        terms = (topic_term[topics] < random_state.random_sample(document_length)[:, np.newaxis]).sum(axis=1)
+        documents.append(['term' + str(term) for term in np.minimum(terms, term_number - 1).tolist()])
+    return documents
+
+
+def write_file_corpus(file_name, documents):
+    """
+    The function that writes documents to one file, whose one line corresponds to one document.
+    :param file_name: the file that the corpus is written to.
+    :param documents: list of documents, each of which is a list of words.
+    :return: Nothing.
+    """
+    file = open(file_name, 'wb')
+    file.write(''.join([' '.join(document) + '\n' for document in documents]))
+    file.close()
+
+
+def write_directory_corpus(directory, documents):
+    """
+    The function that writes documents to a directory, one file per document.
+    :param directory: the directory that the documents are written to, which ends with '/'.
+    :param documents: list of documents, each of which is a list of words.
+    :return: Nothing.
+    """
+    for m in range(0, len(documents), 1):
+        file = open(directory + 'document_' + str(m) + '.txt', 'wb')
+        file.write(' '.join(documents[m]))
+        file.close()
+
+
+def measure(function):
+    """
+    The function that measures the time and the peak memory of calling a function. The peak memory is the growth of
+    the peak resident memory of the process while the function runs, which is only available on Linux, where the peak
+    is reset before the call.
+    :param function: the function, which is called without parameters.
+    :return: tuple of seconds and peak memory in kilobytes, or None if it is not available.
+    """
+    gc.collect()
+    try:
+        file = open('/proc/self/clear_refs', 'w')
+        file.write('5')
+        file.close()
+        resident_memory = memory_status('VmRSS')
+    except IOError:
+        resident_memory = None
+    start_time = time.time()
+    function()
+    seconds = time.time() - start_time
+    peak_memory = memory_status('VmHWM')
+    if resident_memory != None and peak_memory != None:
+        return seconds, max(peak_memory - resident_memory, 0)
+    else:
+        return seconds, None
+
+
+def benchmark_loading(corpus_file, directory):
+    """
+    The function that measures the throughput of loading the same documents from one file and from a directory.
+    :param corpus_file: the file whose one line corresponds to one document, or None.
+    :param directory: the directory where the documents are, which ends with '/', or None.
+    :return: dict of results, and the corpus loaded from the file, or from the directory if corpus_file is None.
+    """
+    results = {}
+    corpus = None
+    for name, path in [('load_file_corpus', corpus_file), ('load_directory_corpus', directory)]:
+        if path == None:
+            continue
+        else:
+            pass
+        loaded_corpus = Corpus()
+        if name == 'load_file_corpus':
+            seconds, peak_memory = measure(lambda: loaded_corpus.load_file_corpus(corpus_file=path, sep=' '))
+        else:
+            seconds, peak_memory = measure(lambda: loaded_corpus.load_directory_corpus(directory=path, sep=' ',
+                                                                                       key_word_list=['txt']))
+        results[name] = {'seconds': seconds, 'peak_memory_kb': peak_memory,
+                         'words_per_second': len(loaded_corpus.tokens) / max(seconds, 1e-9)}
+        if corpus == None:
+            corpus = loaded_corpus
+        else:
+            pass
+    return results, corpus
+
+
+def benchmark_sampling(corpus, topic_number, sweep_number):
+    """
+    The function that measures the samplers, and the methods that update and calculate the distributions.
+    :param corpus: an instance of class: Corpus.
+    :param topic_number: number of topics.
+    :param sweep_number: number of sweeps that are measured for each sampler.
+    :return: dict of results, and the standard sampler after the sweeps.
+    """
+    results = {}
+    samplers = {}
+    for name, sampler_class in [('gibbs', GibbsSampler), ('sparse', SparseGibbsSampler)]:
+        random.seed(0)
+        sampler = sampler_class(corpus=corpus, topic_number=topic_number, alpha=[0.1] * topic_number,
+                                beta=[0.01] * len(corpus.word_id))
+        seconds, peak_memory = measure(sampler.initialize)
+        sweep_seconds = []
+        for sweep_index in range(0, sweep_number, 1):
+            sweep_seconds.append(measure(sampler.sweep)[0])
+        results[name] = {'initialize_seconds': seconds, 'initialize_peak_memory_kb': peak_memory,
+                         'sweep_seconds': sweep_seconds,
+                         'tokens_per_second': len(sampler.tokens) * sweep_number / max(sum(sweep_seconds), 1e-9)}
+        samplers[name] = sampler
+    sampler = samplers['gibbs']
+    update_seconds = [measure(sampler.update_distribution)[0] for index in range(0, 5, 1)]
+    seconds, peak_memory = measure(sampler.get_distribution)
+    results['update_distribution'] = {'seconds': sum(update_seconds) / len(update_seconds)}
+    results['get_distribution'] = {'seconds': seconds, 'peak_memory_kb': peak_memory}
+    return results, sampler
+
+
+def benchmark_output(corpus, sampler, term_number=10):
+    """
+    The function that measures the output of the most probable terms of all topics. The printed text is discarded.
+    :param corpus: an instance of class: Corpus.
+    :param sampler: the sampler whose distributions are output.
+    :param term_number: number of terms of each topic.
+    :return: dict of results.
+    """
+    lda = LDA()
+    lda.corpus = corpus
+    lda.topic_distribution_over_term = sampler.get_topic_distribution_over_term()
+    lda.document_distribution_over_topic = sampler.get_document_distribution_over_topic()
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        seconds, peak_memory = measure(lambda: lda.output_topic(term_number=term_number))
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+    return {'output_topic': {'seconds': seconds, 'peak_memory_kb': peak_memory}}
+
+
+def run_synthetic(size, sweep_number):
+    """
+    The function that runs all benchmarks on a synthetic corpus.
+    :param size: dict of number of documents, terms, words in each document and topics.
+    :param sweep_number: number of sweeps that are measured for each sampler.
+    :return: dict of results.
+    """
+    documents = generate_documents(document_number=size['documents'], term_number=size['terms'],
+                                   document_length=size['length'], topic_number=size['topics'])
+    temporary_directory = tempfile.mkdtemp()
+    try:
+        corpus_file = os.path.join(temporary_directory, 'corpus.txt')
+        write_file_corpus(corpus_file, documents)
+        directory = os.path.join(temporary_directory, 'documents') + '/'
+        os.mkdir(directory)
+        write_directory_corpus(directory, documents)
+        results, corpus = benchmark_loading(corpus_file=corpus_file, directory=directory)
+    finally:
+        shutil.rmtree(temporary_directory)
+    sampling_results, sampler = benchmark_sampling(corpus, topic_number=size['topics'], sweep_number=sweep_number)
+    results.update(sampling_results)
+    results.update(benchmark_output(corpus, sampler))
+    return results
+
+
+def run_reduced(sweep_number, topic_number=10):
+    """
+    The function that runs all benchmarks on the bundled corpus: data/small/ for loading and sampling, and
+    data/file_corpus/corpus.txt for loading from one file.
+    :param sweep_number: number of sweeps that are measured for each sampler.
+    :param topic_number: number of topics.
+    :return: dict of results.
+    """
+    results, corpus = benchmark_loading(corpus_file=None, directory=os.path.join(DATA_DIRECTORY, 'small') + '/')
+    corpus_file = os.path.join(DATA_DIRECTORY, 'file_corpus', 'corpus.txt')
+    if os.path.exists(corpus_file):
+        results.update(benchmark_loading(corpus_file=corpus_file, directory=None)[0])
+    else:
+        pass
+    sampling_results, sampler = benchmark_sampling(corpus, topic_number=topic_number, sweep_number=sweep_number)
+    results.update(sampling_results)
+    results.update(benchmark_output(corpus, sampler))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark of loading corpus, Gibbs Sampling and outputting topics.')
+    parser.add_argument('--output', default='benchmark.json', help='the json file that the results are written to.')
+    parser.add_argument('--reduced', action='store_true', help='measure the bundled corpus in data/ only.')
+    parser.add_argument('--sweeps', type=int, default=3, help='number of sweeps measured for each sampler.')
+    arguments = parser.parse_args()
+
+    report = {'time': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+              'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+              'sweeps': arguments.sweeps, 'runs': []}
+    if arguments.reduced == True:
+        report['runs'].append({'corpus': 'data', 'results': run_reduced(sweep_number=arguments.sweeps)})
+    else:
+        for size in SIZES:
+            report['runs'].append({'corpus': 'synthetic', 'size': size,
+                                   'results': run_synthetic(size, sweep_number=arguments.sweeps)})
+    file = open(arguments.output, 'wb')
+    json.dump(report, file, indent=2, sort_keys=True)
+    file.close()
+    for run in report['runs']:
+        print run['corpus'], run.get('size', ''), \
+            'gibbs tokens/second:', int(run['results']['gibbs']['tokens_per_second']), \
+            'sparse tokens/second:', int(run['results']['sparse']['tokens_per_second'])
+    print 'results are written to:', arguments.output
@@ -4,12 +4,14 @@
 This is used to test LDA, whose corpus is the directory where all documents are.
 """
 import sys
+import logging
 from source.lda import LDA
 reload(sys)
 sys.setdefaultencoding('utf-8')
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
     directory = 'D:/Qianlong/PyCharmProjects/LDA/data/'
     lda = LDA()
     # Loading corpus from directory where all documents are.
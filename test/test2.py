@@ -4,12 +4,14 @@
 This is used to test LDA model, whose corpus is an file whose one line corresponding to one document.
 """
 import sys
+import logging
 from source.lda import LDA
 reload(sys)
 sys.setdefaultencoding('utf-8')
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
     file_corpus = 'D:/Qianlong/PyCharmProjects/LDA/data/file_corpus/corpus.txt'
     lda = LDA()
     # Loading corpus from an file.
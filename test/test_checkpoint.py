@@ -0,0 +1,48 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+This is used to test the checkpoints of Gibbs Sampling, from which an interrupted chain is resumed.
+"""
+import sys
+import random
+import numpy as np
+from source.lda import LDA
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def train(checkpoint_file, iteration_number, resume=False, sampler='gibbs', seed=2):
+    """
+    The function that trains a small model on random documents, with a checkpoint every 4 iterations.
+    :param checkpoint_file: the file of the checkpoint.
+    :param iteration_number: number of iterations.
+    :param resume: boolean value, whether to continue from the checkpoint. Default value is False.
+    :param sampler: 'gibbs' or 'sparse'. Default value is 'gibbs'.
+    :param seed: seed of the random number generators of the chain. Default value is 2.
+    :return: an instance of LDA.
+    """
+    random.seed(1)
+    lda = LDA()
+    words = ['word' + str(t) for t in range(0, 200, 1)]
+    for m in range(0, 40, 1):
+        document = [random.choice(words) for n in range(0, 30, 1)]
+        lda.corpus.add_document(lda.corpus.words_to_ids(document), m)
+    random.seed(seed)
+    np.random.seed(seed)
+    lda.train_model(topic_number=5,iteration_number=iteration_number,burn_in=5,update_cycle=3,
+                    checkpoint_file=checkpoint_file,checkpoint_cycle=4,resume=resume,sampler=sampler)
+    return lda
+
+
+def test_resume_equals_uninterrupted_run(tmpdir):
+    for sampler in ['gibbs', 'sparse']:
+        checkpoint_file = str(tmpdir.join(sampler + '.npz'))
+        uninterrupted = train(checkpoint_file=None, iteration_number=30, sampler=sampler)
+        # the interrupted chain saves its last checkpoint after iteration 12.
+        train(checkpoint_file=checkpoint_file, iteration_number=14, sampler=sampler)
+        # with another seed, so that the random state must come from the checkpoint.
+        resumed = train(checkpoint_file=checkpoint_file, iteration_number=30, resume=True, sampler=sampler,
+                        seed=3)
+        assert np.array_equal(resumed.topic_distribution_over_term, uninterrupted.topic_distribution_over_term)
+        assert np.array_equal(resumed.document_distribution_over_topic,
+                              uninterrupted.document_distribution_over_topic)
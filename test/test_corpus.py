@@ -0,0 +1,56 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+This is used to test Corpus, whose vocabulary is pruned.
+"""
+import sys
+import random
+from source.corpus import Corpus
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def random_corpus():
+    """
+    The function that builds a corpus of random documents whose words follow a power law, with some empty documents.
+    :return: tuple of an instance of Corpus and the list of documents, each of which is a list of words.
+    """
+    random.seed(3)
+    corpus = Corpus()
+    documents = []
+    for m in range(0, 300, 1):
+        document = ['w' + str(int(random.paretovariate(1.0))) for n in range(0, random.randint(0, 40), 1)]
+        corpus.add_document(corpus.words_to_ids(document), m)
+        documents.append(document)
+    return corpus, documents
+
+
+def test_prune_vocabulary_remaps_ids():
+    for block_size in [7, 50, 1048576]:
+        corpus, documents = random_corpus()
+        old_words = corpus.vocabulary()
+        report = corpus.prune_vocabulary(min_df=2, max_df=0.5, max_terms=40, block_size=block_size)
+        words = corpus.vocabulary()
+        # the remaining terms keep their old order, and are numbered from 0.
+        assert len(words) == report['term_number'] <= 40
+        assert sorted(words, key=old_words.index) == words
+        assert [corpus.word_to_id(word) for word in words] == range(0, len(words), 1)
+        kept = set(words)
+        for m in range(0, len(documents), 1):
+            assert [corpus.id_to_word(t) for t in corpus.documents[m].tolist()] == \
+                [word for word in documents[m] if word in kept]
+        assert report['token_number'] == len(corpus.token_array())
+        assert report['empty_documents'] == sum([len(document) == 0 for document in corpus.documents])
+
+
+def test_prune_vocabulary_of_selected_documents():
+    corpus, documents = random_corpus()
+    selected = corpus.select_documents(range(0, 300, 2))
+    selected.prune_vocabulary(min_df=3)
+    kept = set(selected.vocabulary())
+    for m in range(0, 150, 1):
+        assert [selected.id_to_word(t) for t in selected.documents[m].tolist()] == \
+            [word for word in documents[2 * m] if word in kept]
+    # the pruned corpus can still grow.
+    selected.add_document([0, 1], 'new')
+    assert selected.documents[150].tolist() == [0, 1]
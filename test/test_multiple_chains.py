@@ -0,0 +1,28 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+This is used to test the matching of topics of several chains.
+"""
+import sys
+import itertools
+import numpy as np
+from source.multipleChains import linear_assignment
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def test_linear_assignment_matches_brute_force():
+    random_state = np.random.RandomState(0)
+    for n in range(1, 7, 1):
+        for trial in range(0, 20, 1):
+            cost = random_state.rand(n, n)
+            if trial % 2 == 1:
+                # many equal costs.
+                cost = np.round(cost * 3)
+            else:
+                pass
+            assignment = linear_assignment(cost)
+            assert sorted(assignment.tolist()) == range(0, n, 1)
+            best = min([cost[range(0, n, 1), list(permutation)].sum()
+                        for permutation in itertools.permutations(range(0, n, 1))])
+            assert np.isclose(cost[range(0, n, 1), assignment].sum(), best)
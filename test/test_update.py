@@ -0,0 +1,57 @@
+# /usr/bin/env python
+# -*- coding:utf-8 -*-
+"""
+This is used to test LDA.update, which adds documents with new words to a trained model.
+"""
+import sys
+import random
+import numpy as np
+from source.lda import LDA
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+
+def random_documents(document_number, words, length=30):
+    """
+    The function that draws documents of random words.
+    :param document_number: number of documents.
+    :param words: list of words that the documents are drawn from.
+    :param length: number of words in a document. Default value is 30.
+    :return: list of documents, each of which is a list of words.
+    """
+    return [[random.choice(words) for n in range(0, length, 1)] for m in range(0, document_number, 1)]
+
+
+def trained_model(sampler='gibbs'):
+    """
+    The function that trains a small model on random documents.
+    :param sampler: 'gibbs' or 'sparse'. Default value is 'gibbs'.
+    :return: an instance of LDA.
+    """
+    random.seed(1)
+    lda = LDA()
+    words = ['word' + str(t) for t in range(0, 200, 1)]
+    for document in random_documents(40, words):
+        lda.corpus.add_document(lda.corpus.words_to_ids(document), len(lda.corpus.documents_name_dict))
+    lda.train_model(topic_number=5,iteration_number=30,burn_in=10,update_cycle=5,sampler=sampler)
+    return lda
+
+
+def test_update_with_new_words_keeps_topics_normalized():
+    for sampler in ['gibbs', 'sparse']:
+        lda = trained_model(sampler=sampler)
+        term_number = len(lda.corpus.word_id)
+        # many more new terms than old ones, so that the smoothing of the old updates would dominate.
+        new_words = ['new' + str(t) for t in range(0, 2000, 1)]
+        document_list = lda.update(random_documents(5, new_words, length=400), iterations=10)
+        assert len(lda.corpus.word_id) > term_number
+        assert document_list == range(40, 45, 1)
+        assert lda.topic_distribution_over_term.shape == (5, len(lda.corpus.word_id))
+        assert np.allclose(lda.topic_distribution_over_term.sum(axis=1, dtype=np.float64), 1.0, atol=1e-4)
+        assert np.allclose(lda.document_distribution_over_topic.sum(axis=1, dtype=np.float64), 1.0, atol=1e-4)
+
+
+def test_update_without_samples_keeps_topics_normalized():
+    lda = trained_model()
+    lda.update(random_documents(2, ['new' + str(t) for t in range(0, 500, 1)]), iterations=1, burn_in=1)
+    assert np.allclose(lda.topic_distribution_over_term.sum(axis=1, dtype=np.float64), 1.0, atol=1e-4)